@@ -10,10 +10,13 @@ import sys
 from configparser import ConfigParser
 from datetime import datetime
 from json import load as jsonload
+from json import dumps as jsondumps
 from locale import LC_ALL, getdefaultlocale, getlocale, setlocale
-from os import _exit, execl, mkdir
+from os import _exit, environ, execl, mkdir
 from os import name as osname
 from os import path
+from os import remove as osremove
+from os import replace as osreplace
 from os import system as ossystem
 from platform import machine as osprocessor
 from pathlib import Path
@@ -24,10 +27,15 @@ from socket import socket
 from subprocess import DEVNULL, Popen, check_call, call
 from threading import Thread as thrThread
 from threading import Lock
+from queue import Queue, Empty, Full
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from time import ctime, sleep, strptime, time
-from statistics import mean
+from collections import deque
 from random import choice
 import select
+import asyncio
+import gzip
+import shutil
 import pip
 
 
@@ -101,11 +109,30 @@ PERIODIC_REPORT_TIME = 60
 AVR_TIMEOUT = 3.1  # diff 6 * 100 / 196 h/s = 3.06
 BAUDRATE = 115200
 RESOURCES_DIR = 'AVRMiner_' + str(MINER_VER) + '_resources'
+STATS_WINDOW = 20  # Samples kept per board for the rolling statistics
+# Histogram buckets (seconds) of the metrics endpoint
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COMPUTE_BUCKETS = (0.5, 1, 1.5, 2, 2.5, 3, 4, 5, 7.5, 10)
+DASHBOARD_REFRESH = 1  # Seconds between dashboard redraws
 shares = [0, 0]
-hashrate_mean = []
-ping_mean = []
+board_stats = {}
 diff = 0
 shuffle_ports = "y"
+engine = 'threads'
+metrics_port = 0
+journal_path = ''
+journal_max_mb = 10
+journal_backups = 5
+journal_compress = 'y'
+journal_queue = None
+journal_file = None
+dashboard = 'n'
+dashboard_running = False
+dashboard_log = deque(maxlen=100)
+dashboard_errors = {}
+JOURNAL_FLUSH_TIME = 5
+# Shares waiting for the journal writer, newer ones are dropped past it
+JOURNAL_QUEUE_SIZE = 10000
 donator_running = False
 job = ''
 debug = 'n'
@@ -198,7 +225,10 @@ def get_prefix(diff: int):
 
 def debug_output(text: str):
     # Debug output
-    if debug == 'y':
+    if debug == 'y' and dashboard_running:
+        dashboard_log.append(now().strftime('%H:%M:%S ')
+                             + 'DEBUG: ' + str(text))
+    elif debug == 'y':
         print(
             Style.RESET_ALL
             + now().strftime(Style.DIM + '%H:%M:%S.%f ')
@@ -208,6 +238,8 @@ def debug_output(text: str):
 
 def title(title: str):
     # Window title
+    if dashboard_running:
+        return
     if osname == 'nt':
         # Windows systems
         ossystem('title ' + title)
@@ -219,6 +251,9 @@ def title(title: str):
 
 def handler(signal_received, frame):
     # SIGINT handler
+    if dashboard_running:
+        # Give the terminal back before printing
+        curses.endwin()
     pretty_print(
         'sys0',
         get_string('sigint_detected')
@@ -231,6 +266,11 @@ def handler(signal_received, frame):
         socket.close()
     except Exception:
         pass
+    try:
+        # Flush the buffered share journal
+        journal_file.close()
+    except Exception:
+        pass
     _exit(0)
 
 
@@ -247,6 +287,13 @@ def load_config():
     global rig_identifier
     global discord_presence
     global shuffle_ports
+    global engine
+    global metrics_port
+    global journal_path
+    global journal_max_mb
+    global journal_backups
+    global journal_compress
+    global dashboard
     global SOC_TIMEOUT
     global AVR_TIMEOUT
     global PERIODIC_REPORT_TIME
@@ -365,7 +412,14 @@ def load_config():
             "avr_timeout":      3.1,
             "discord_presence": "y",
             "periodic_report":  60,
-            "shuffle_ports":    "y"
+            "shuffle_ports":    "y",
+            "engine":           "threads",
+            "metrics_port":     0,
+            "journal":          "",
+            "journal_max_mb":   10,
+            "journal_backups":  5,
+            "journal_compress": "y",
+            "dashboard":        "n"
         }
 
         # Write data to file
@@ -390,6 +444,17 @@ def load_config():
         shuffle_ports = config["Duino-Coin-AVR-Miner"]["shuffle_ports"]
         PERIODIC_REPORT_TIME = int(
             config["Duino-Coin-AVR-Miner"]["periodic_report"])
+        engine = config["Duino-Coin-AVR-Miner"].get("engine", "threads")
+        metrics_port = int(
+            config["Duino-Coin-AVR-Miner"].get("metrics_port", 0))
+        journal_path = config["Duino-Coin-AVR-Miner"].get("journal", "")
+        journal_max_mb = float(
+            config["Duino-Coin-AVR-Miner"].get("journal_max_mb", 10))
+        journal_backups = int(
+            config["Duino-Coin-AVR-Miner"].get("journal_backups", 5))
+        journal_compress = config["Duino-Coin-AVR-Miner"].get(
+            "journal_compress", "y")
+        dashboard = config["Duino-Coin-AVR-Miner"].get("dashboard", "n")
 
 
 def greeting():
@@ -545,8 +610,18 @@ def update_rich_presence():
         sleep(15)
 
 
-def pretty_print(message_type, message, state):
+def pretty_print(message_type, message, state, com=None):
     # Print output messages in the DUCO 'standard'
+    if dashboard_running:
+        # The dashboard shows them in its log pane, errors and
+        # warnings also in the row of their board (com port)
+        text = (now().strftime('%H:%M:%S ')
+                + sub(r'\x1b\[[0-9;]*m', '', message).strip())
+        dashboard_log.append(message_type + ' ' + text)
+        if com and state != 'success':
+            dashboard_errors[com] = text
+        return
+
     # Usb/net/sys background
     if message_type.startswith('net'):
         background = Back.BLUE
@@ -580,9 +655,520 @@ def pretty_print(message_type, message, state):
               + Fore.RESET)
 
 
-def mine_avr(com, threadid):
+class RollingStats:
+    # Rolling statistics over the last `size` samples - a fixed-size
+    # ring buffer with an O(1) running mean, percentiles are only
+    # computed when asked for
+    def __init__(self, size: int = STATS_WINDOW):
+        self.samples = deque(maxlen=size)
+        self.total = 0
+
+    def add(self, value: float):
+        if len(self.samples) == self.samples.maxlen:
+            self.total -= self.samples[0]
+        self.samples.append(value)
+        self.total += value
+
+    def mean(self):
+        if not self.samples:
+            return 0
+        return self.total / len(self.samples)
+
+    def percentile(self, percent: float):
+        if not self.samples:
+            return 0
+        ordered = sorted(self.samples)
+        index = round(percent / 100 * (len(ordered) - 1))
+        return ordered[index]
+
+    def min(self):
+        return min(self.samples, default=0)
+
+    def max(self):
+        return max(self.samples, default=0)
+
+
+class Histogram:
+    # Prometheus style histogram - per-bucket counts, count and sum
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value: float):
+        for bucket, upper_bound in enumerate(self.buckets):
+            if value <= upper_bound:
+                self.counts[bucket] += 1
+                break
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        counts, running = [], 0
+        for count in self.counts:
+            running += count
+            counts.append(running)
+        return counts
+
+
+def get_board_stats(com):
+    # Rolling hashrate and ping statistics of a single board,
+    # plus the counters and histograms of the metrics endpoint
+    return board_stats.setdefault(com, {
+        'hashrate': RollingStats(),
+        'ping': RollingStats(),
+        'accepted': 0,
+        'rejected': 0,
+        'blocks': 0,
+        'difficulty': 0,
+        'connections': 0,
+        'serial_errors': 0,
+        'chip_id': '',
+        'latency': Histogram(LATENCY_BUCKETS),
+        'compute_time': Histogram(COMPUTE_BUCKETS)})
+
+
+def count_serial_error(com):
+    get_board_stats(com)['serial_errors'] += 1
+
+
+def total_hashrate():
+    # Sum of the mean hashrates of all boards
+    return sum(stats['hashrate'].mean()
+               for stats in list(board_stats.values()))
+
+
+def process_result(com, result):
+    # Convert the result read from the board, returns
+    # (formatted compute time, hashrate, chip ID)
     global hashrate
+    debug_output(
+        com
+        + ': received result ('
+        + str(result[0])
+        + ')')
+    debug_output(
+        com
+        + ': received time ('
+        + str(result[1])
+        + ')')
+    # Convert AVR time to seconds
+    computetime = round(int(result[1]) / 1000000, 3)
+    get_board_stats(com)['compute_time'].observe(computetime)
+    if computetime < 1:
+        computetime = str(
+            int(computetime * 1000)) + "ms"
+    else:
+        computetime = str(round(computetime, 2)) + "s"
+    # Calculate hashrate
+    hashrate_t = round(
+        int(result[0]) * 1000000 / int(result[1]), 2)
+    get_board_stats(com)['hashrate'].add(hashrate_t)
+    hashrate = total_hashrate()
+    debug_output(
+        com +
+        ': calculated hashrate (' +
+        str(hashrate_t) + ')'
+        + ' (avg:' + str(get_board_stats(com)['hashrate'].mean()) + ')')
+
+    try:
+        chipID = result[2]
+        debug_output(
+            com + ': chip ID: ' + str(result[2]))
+        """ Check if chipID got received, this is 
+            of course just a fraction of what's 
+            happening on the server with it """
+        if not chipID.startswith('DUCOID'):
+            raise Exception('Wrong chipID string')
+    except Exception:
+        pretty_print(
+            'usb'
+            + str(''.join(filter(str.isdigit, com))),
+            ' Possible incorrect chip ID!'
+            + Style.NORMAL
+            + Fore.RESET
+            + ' This can cause problems with the'
+            + ' Kolka system',
+            'warning', com=com)
+        chipID = 'None'
+    get_board_stats(com)['chip_id'] = chipID
+    return computetime, hashrate_t, chipID
+
+
+def share_print(com, feedback, computetime, diff, ping):
+    # Count the share and print it in the DUCO 'standard'
+    stats = get_board_stats(com)
+    stats['difficulty'] = diff
+    diff = get_prefix(diff)
+    if feedback == 'GOOD':
+        # If result was correct
+        shares[0] += 1
+        stats['accepted'] += 1
+        share_color = Fore.GREEN
+        share_str = ' ⛏' + get_string('accepted')
+    elif feedback == 'BLOCK':
+        # If block was found
+        shares[0] += 1
+        stats['accepted'] += 1
+        stats['blocks'] += 1
+        share_color = Fore.CYAN
+        share_str = ' ⛏' + get_string('block_found')
+    else:
+        # If result was incorrect
+        shares[1] += 1
+        stats['rejected'] += 1
+        share_color = Fore.RED
+        share_str = ' ✗' + get_string('rejected')
+
+    if dashboard_running:
+        return
+
+    title(
+        get_string('duco_avr_miner')
+        + str(MINER_VER)
+        + ') - '
+        + str(shares[0])
+        + '/'
+        + str(shares[0] + shares[1])
+        + get_string('accepted_shares'))
+    with thread_lock:
+        print(
+            Style.RESET_ALL
+            + Fore.WHITE
+            + now().strftime(Style.DIM + '%H:%M:%S ')
+            + Style.BRIGHT
+            + Back.MAGENTA
+            + Fore.RESET
+            + ' usb'
+            + str(''.join(filter(str.isdigit, com)))
+            + ' '
+            + Back.RESET
+            + share_color
+            + share_str
+            + Fore.RESET
+            + str(int(shares[0]))
+            + '/'
+            + str(int(shares[0] + shares[1]))
+            + Fore.YELLOW
+            + ' ('
+            + str(int((shares[0]
+                       / (shares[0] + shares[1]) * 100)))
+            + '%)'
+            + Style.NORMAL
+            + Fore.RESET
+            + ' ∙ '
+            + Fore.BLUE
+            + Style.BRIGHT
+            + str(round(get_board_stats(com)['hashrate'].mean()))
+            + ' H/s'
+            + Style.NORMAL
+            + ' ('
+            + computetime
+            + ')'
+            + Fore.RESET
+            + ' ⚙ diff '
+            + str(diff)
+            + ' ∙ '
+            + Fore.CYAN
+            + 'ping '
+            + str('%02.0f' % int(ping))
+            + 'ms')
+
+
+def dashboard_lines(height: int):
+    # Dashboard text as (line, color pair) tuples - a summary, one row
+    # per board and the latest messages below, fitted to the height
+    row = '{:<14} {:<22} {:>9} {:>9} {:>9} {:>7}  {}'
+    boards = sorted(list(board_stats.items()))
+    lines = [(' Duino-Coin AVR Miner v' + str(MINER_VER)
+              + ' ∙ ' + str(len(boards)) + ' boards'
+              + ' ∙ ' + str(round(total_hashrate())) + ' H/s'
+              + ' ∙ ' + str(shares[0]) + '/' + str(shares[0] + shares[1])
+              + ' accepted ∙ ' + calculate_uptime(mining_start_time), 3),
+             (row.format('PORT', 'CHIP ID', 'HASHRATE', 'ACCEPTED',
+                         'REJECTED', 'PING', 'LAST ERROR'), 3)]
+
+    log_height = min(len(dashboard_log), max(height // 4, 3))
+    space = height - len(lines) - log_height - 1
+    if len(boards) > space:
+        space -= 1
+    for com, stats in boards[:max(space, 0)]:
+        error = dashboard_errors.get(com, '')
+        lines.append((row.format(
+            com, stats['chip_id'] or '-',
+            str(round(stats['hashrate'].mean())) + ' H/s',
+            stats['accepted'], stats['rejected'],
+            str(round(stats['ping'].mean())) + 'ms',
+            error), 2 if error else 1))
+    if len(boards) > space:
+        lines.append(('... ' + str(len(boards) - max(space, 0))
+                      + ' more boards', 0))
+
+    lines.append(('', 0))
+    for message in list(dashboard_log)[-log_height:]:
+        lines.append((message, 0))
+    return lines[:height]
+
+
+def run_dashboard(screen):
+    # Redraws the dashboard in place every DASHBOARD_REFRESH seconds
+    try:
+        curses.curs_set(0)
+        curses.start_color()
+        curses.use_default_colors()
+        curses.init_pair(1, curses.COLOR_GREEN, -1)
+        curses.init_pair(2, curses.COLOR_RED, -1)
+        curses.init_pair(3, curses.COLOR_CYAN, -1)
+    except curses.error:
+        pass
+
+    while True:
+        height, width = screen.getmaxyx()
+        screen.erase()
+        for y, (line, color) in enumerate(dashboard_lines(height)):
+            try:
+                screen.addnstr(y, 0, line, width - 1,
+                               curses.color_pair(color))
+            except curses.error:
+                pass
+        screen.refresh()
+        sleep(DASHBOARD_REFRESH)
+
+
+def start_dashboard():
+    # Live dashboard replacing the per-share lines
+    global curses
+    global dashboard_running
+    try:
+        import curses
+    except ModuleNotFoundError:
+        print(
+            now().strftime('%H:%M:%S ')
+            + 'Curses is not installed. '
+            + 'Miner will try to install it. '
+            + 'If it fails, please manually install "windows-curses" '
+            + 'python3 package or set dashboard to n.')
+        install('windows-curses')
+        import curses
+
+    for port in avrport:
+        get_board_stats(port)
+    dashboard_running = True
+    thrThread(target=curses.wrapper,
+              args=(run_dashboard,),
+              daemon=True).start()
+
+
+def start_journal():
+    # JSON-lines share journal - the mining threads only put records
+    # on a queue, buffered writes and rotation happen in a writer thread
+    global journal_queue
+    journal_queue = Queue(JOURNAL_QUEUE_SIZE)
+    thrThread(target=journal_writer, daemon=True).start()
+
+
+def journal_share(com, result, hashrate_t, feedback, diff, ping):
+    if journal_queue is not None:
+        try:
+            journal_queue.put_nowait({'ts': round(time(), 3),
+                                      'board': com,
+                                      'diff': diff,
+                                      'nonce': int(result[0]),
+                                      'hashrate': hashrate_t,
+                                      'compute': int(result[1]) / 1000000,
+                                      'ping': round(ping, 1),
+                                      'result': feedback})
+        except Full:
+            pass
+
+
+def rotate_journal():
+    # journal -> journal.1[.gz] -> ... -> journal.<journal_backups>[.gz]
+    suffix = '.gz' if journal_compress == 'y' else ''
+    for i in range(journal_backups - 1, 0, -1):
+        if path.isfile(journal_path + '.' + str(i) + suffix):
+            osreplace(journal_path + '.' + str(i) + suffix,
+                      journal_path + '.' + str(i + 1) + suffix)
+    if journal_backups < 1:
+        osremove(journal_path)
+    elif journal_compress == 'y':
+        with open(journal_path, 'rb') as src, \
+                gzip.open(journal_path + '.1.gz', 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        osremove(journal_path)
+    else:
+        osreplace(journal_path, journal_path + '.1')
+
+
+def journal_writer():
+    global journal_file
+    global journal_queue
+    max_bytes = journal_max_mb * 1024 * 1024
+    size = None
+    last_flush = time()
+    while True:
+        try:
+            if size is None or journal_file.closed:
+                # First open, or a failed rotation left it closed
+                journal_file = open(journal_path, 'a', buffering=64 * 1024)
+                size = path.getsize(journal_path)
+            try:
+                line = jsondumps(
+                    journal_queue.get(timeout=JOURNAL_FLUSH_TIME),
+                    separators=(',', ':')) + '\n'
+                journal_file.write(line)
+                size += len(line)
+            except Empty:
+                pass
+
+            if time() - last_flush >= JOURNAL_FLUSH_TIME:
+                journal_file.flush()
+                last_flush = time()
+            if size >= max_bytes:
+                journal_file.close()
+                rotate_journal()
+                journal_file = open(journal_path, 'a', buffering=64 * 1024)
+                size = 0
+        except Exception as e:
+            if size is None:
+                # Can't even open it - stop queueing shares
+                journal_queue = None
+                pretty_print('sys0',
+                             ' Can\'t open the share journal, '
+                             + 'journaling disabled: ' + str(e),
+                             'error')
+                return
+            debug_output('Share journal error: ' + str(e))
+            sleep(JOURNAL_FLUSH_TIME)
+
+
+class LineReader:
+    # Newline framed reader of the node protocol - TCP can split or
+    # coalesce messages, so bytes are received with recv_into into one
+    # reusable buffer and only whole lines are handed out.
+    # Used by both engines: the threads engine fills it with blocking
+    # recv_into calls, the asyncio one through the event loop
+    SIZE = 4096
+
+    def __init__(self, soc):
+        self.soc = soc
+        self.buffer = bytearray(LineReader.SIZE)
+        self.view = memoryview(self.buffer)
+        self.start = 0
+        self.end = 0
+
+    def free(self):
+        # The part of the buffer the next bytes are received into
+        if self.end == LineReader.SIZE:
+            if not self.start:
+                raise ConnectionError('Message longer than '
+                                      + str(LineReader.SIZE) + ' bytes')
+            # Move the partial line to the front, only when full
+            self.buffer[:self.end - self.start] = bytes(
+                self.view[self.start:self.end])
+            self.start, self.end = 0, self.end - self.start
+        return self.view[self.end:]
+
+    def received(self, count: int):
+        if not count:
+            raise ConnectionError('Connection closed by the node')
+        self.end += count
+
+    def fill(self):
+        self.received(self.soc.recv_into(self.free()))
+
+    async def fill_async(self):
+        loop = asyncio.get_running_loop()
+        self.received(await loop.sock_recv_into(self.soc, self.free()))
+
+    def take(self, end: int, skip: int):
+        message = str(self.view[self.start:end], 'utf-8')
+        self.start = end + skip
+        if self.start == self.end:
+            self.start = self.end = 0
+        return message
+
+    def next_line(self):
+        # The next whole line, None if it wasn't fully received yet
+        newline = self.buffer.find(b'\n', self.start, self.end)
+        if newline >= 0:
+            return self.take(newline, 1)
+        return None
+
+    def readline(self):
+        line = self.next_line()
+        while line is None:
+            self.fill()
+            line = self.next_line()
+        return line
+
+    async def readline_async(self):
+        line = self.next_line()
+        while line is None:
+            await self.fill_async()
+            line = self.next_line()
+        return line
+
+    def read_any(self):
+        # Everything received so far - for the unframed
+        # version banner and the MOTD, which can span several lines
+        if self.start == self.end:
+            self.fill()
+        return self.take(self.end, 0).rstrip('\n')
+
+    async def read_any_async(self):
+        if self.start == self.end:
+            await self.fill_async()
+        return self.take(self.end, 0).rstrip('\n')
+
+
+def open_port(com):
+    # Open the serial port of a board, retrying until it's available
+    while True:
+        try:
+            debug_output(com + ': opening serial port')
+            return Serial(com,
+                          baudrate=int(BAUDRATE),
+                          timeout=float(AVR_TIMEOUT))
+        except Exception as e:
+            pretty_print(
+                'usb'
+                + str(''.join(filter(str.isdigit, com))),
+                get_string('board_connection_error')
+                + str(com)
+                + get_string('board_connection_error2')
+                + Style.NORMAL
+                + Fore.RESET
+                + ' (port connection err: '
+                + str(e)
+                + ')',
+                'error', com=com)
+            count_serial_error(com)
+            sleep(10)
+
+
+def port_healthy(ser):
+    # Check that a port kept open between jobs still works,
+    # also drops stale data left from a previous timed out job
+    try:
+        if not ser.is_open:
+            return False
+        ser.reset_input_buffer()
+        return True
+    except Exception:
+        return False
 
+
+def close_port(ser):
+    try:
+        ser.close()
+    except Exception:
+        pass
+
+
+def mine_avr(com, threadid):
+    ser = None
     start_time = time()
     report_shares, last_shares = 0, 0
     while True:
@@ -595,7 +1181,9 @@ def mine_avr(com, threadid):
                     soc = socket()
                     soc.connect((str(NODE_ADDRESS), int(NODE_PORT)))
                     soc.settimeout(SOC_TIMEOUT)
-                    server_version = soc.recv(100).decode()
+                    get_board_stats(com)['connections'] += 1
+                    soc_reader = LineReader(soc)
+                    server_version = soc_reader.read_any()
 
                     if threadid == 0:
                         if float(server_version) <= float(MINER_VER):
@@ -619,11 +1207,11 @@ def mine_avr(com, threadid):
                                 + Style.NORMAL
                                 + Fore.RESET
                                 + get_string('update_warning'),
-                                'warning')
+                                'warning', com=com)
                             sleep(10)
 
                         soc.send(bytes("MOTD", encoding="ascii"))
-                        motd = soc.recv(1024).decode().rstrip("\n")
+                        motd = soc_reader.read_any()
 
                         if "\n" in motd:
                             motd = motd.replace("\n", "\n\t\t")
@@ -643,7 +1231,7 @@ def mine_avr(com, threadid):
                         + ' ('
                         + str(e)
                         + ')',
-                        'error')
+                        'error', com=com)
                     debug_output('Connection error: ' + str(e))
                     sleep(10)
 
@@ -669,7 +1257,7 @@ def mine_avr(com, threadid):
                         encoding='ascii'))
 
                 # Retrieve work
-                job = soc.recv(128).decode().rstrip("\n")
+                job = soc_reader.readline()
                 job = job.split(",")
                 debug_output("Received: " + str(job))
 
@@ -682,42 +1270,22 @@ def mine_avr(com, threadid):
                                  + str(''.join(filter(str.isdigit, com))),
                                  " Node message: "
                                  + job[1],
-                                 "warning")
+                                 "warning", com=com)
                     sleep(3)
 
                 while True:
-                    while True:
-                        try:
-                            ser.close()
-                        except:
-                            pass
-
-                        try:
-                            ser = Serial(com,
-                                         baudrate=int(BAUDRATE),
-                                         timeout=float(AVR_TIMEOUT))
-                            break
-                        except Exception as e:
-                            pretty_print(
-                                'usb'
-                                + str(''.join(filter(str.isdigit, com))),
-                                get_string('board_connection_error')
-                                + str(com)
-                                + get_string('board_connection_error2')
-                                + Style.NORMAL
-                                + Fore.RESET
-                                + ' (port connection err: '
-                                + str(e)
-                                + ')',
-                                'error')
-                            sleep(10)
-
                     while True:
                         retry_counter = 0
                         while True:
                             if retry_counter >= 3:
                                 break
 
+                            if ser is None or not port_healthy(ser):
+                                # The port is kept open between jobs and
+                                # only (re)opened after an I/O error
+                                close_port(ser)
+                                ser = open_port(com)
+
                             try:
                                 debug_output(com + ': sending job to AVR')
                                 ser.write(
@@ -755,58 +1323,15 @@ def mine_avr(com, threadid):
                                     com
                                     + ': retrying sending data: '
                                     + str(e))
+                                count_serial_error(com)
+                                if isinstance(e, OSError):
+                                    close_port(ser)
+                                    ser = None
                                 retry_counter += 1
 
                         try:
-                            debug_output(
-                                com
-                                + ': received result ('
-                                + str(result[0])
-                                + ')')
-                            debug_output(
-                                com
-                                + ': received time ('
-                                + str(result[1])
-                                + ')')
-                            # Convert AVR time to seconds
-                            computetime = round(int(result[1]) / 1000000, 3)
-                            if computetime < 1:
-                                computetime = str(
-                                    int(computetime * 1000)) + "ms"
-                            else:
-                                computetime = str(round(computetime, 2)) + "s"
-                            # Calculate hashrate
-                            hashrate_t = round(
-                                int(result[0]) * 1000000 / int(result[1]), 2)
-                            hashrate_mean.append(hashrate_t)
-                            # Get average from the last hashrate measurements
-                            hashrate = mean(hashrate_mean[-5:])
-                            debug_output(
-                                com +
-                                ': calculated hashrate (' +
-                                str(hashrate_t) + ')'
-                                + ' (avg:' + str(hashrate) + ')')
-
-                            try:
-                                chipID = result[2]
-                                debug_output(
-                                    com + ': chip ID: ' + str(result[2]))
-                                """ Check if chipID got received, this is 
-                                    of course just a fraction of what's 
-                                    happening on the server with it """
-                                if not chipID.startswith('DUCOID'):
-                                    raise Exception('Wrong chipID string')
-                            except Exception:
-                                pretty_print(
-                                    'usb'
-                                    + str(''.join(filter(str.isdigit, com))),
-                                    ' Possible incorrect chip ID!'
-                                    + Style.NORMAL
-                                    + Fore.RESET
-                                    + ' This can cause problems with the'
-                                    + ' Kolka system',
-                                    'warning')
-                                chipID = 'None'
+                            computetime, hashrate_t, chipID = (
+                                process_result(com, result))
                             break
                         except Exception as e:
                             pretty_print(
@@ -819,7 +1344,7 @@ def mine_avr(com, threadid):
                                 + str(e)
                                 + ', please check connection '
                                 + 'and port setting)',
-                                'warning')
+                                'warning', com=com)
                             debug_output(
                                 com + ': error splitting data: ' + str(e))
                             sleep(1)
@@ -848,7 +1373,7 @@ def mine_avr(com, threadid):
                             + ' ('
                             + str(e)
                             + ')',
-                            'error')
+                            'error', com=com)
                         debug_output(com + ': connection error: ' + str(e))
                         sleep(5)
                         break
@@ -856,13 +1381,18 @@ def mine_avr(com, threadid):
                     while True:
                         try:
                             responsetimetart = now()
-                            feedback = soc.recv(64).decode().rstrip('\n')
+                            feedback = soc_reader.readline()
                             responsetimestop = now()
 
+                            # Whole delta in seconds - .microseconds
+                            # would only be its sub-second part
                             time_delta = (responsetimestop -
-                                          responsetimetart).microseconds
-                            ping_mean.append(round(time_delta / 1000))
-                            ping = mean(ping_mean[-10:])
+                                          responsetimetart).total_seconds()
+                            ping_stats = get_board_stats(com)['ping']
+                            ping_stats.add(round(time_delta * 1000))
+                            get_board_stats(com)['latency'].observe(
+                                time_delta)
+                            ping = ping_stats.mean()
                             debug_output(com + ': feedback: '
                                          + str(feedback)
                                          + ' with ping: '
@@ -878,177 +1408,15 @@ def mine_avr(com, threadid):
                                 + ' (err parsing response: '
                                 + str(e)
                                 + ')',
-                                'error')
+                                'error', com=com)
                             debug_output(com + ': error parsing response: '
                                          + str(e))
                             sleep(5)
                             break
 
-                    diff = get_prefix(diff)
-                    if feedback == 'GOOD':
-                        # If result was correct
-                        shares[0] += 1
-                        title(
-                            get_string('duco_avr_miner')
-                            + str(MINER_VER)
-                            + ') - '
-                            + str(shares[0])
-                            + '/'
-                            + str(shares[0] + shares[1])
-                            + get_string('accepted_shares'))
-                        with thread_lock:
-                            print(
-                                Style.RESET_ALL
-                                + Fore.WHITE
-                                + now().strftime(Style.DIM + '%H:%M:%S ')
-                                + Style.BRIGHT
-                                + Back.MAGENTA
-                                + Fore.RESET
-                                + ' usb'
-                                + str(''.join(filter(str.isdigit, com)))
-                                + ' '
-                                + Back.RESET
-                                + Fore.GREEN
-                                + ' ⛏'
-                                + get_string('accepted')
-                                + Fore.RESET
-                                + str(int(shares[0]))
-                                + '/'
-                                + str(int(shares[0] + shares[1]))
-                                + Fore.YELLOW
-                                + ' ('
-                                + str(int((shares[0]
-                                           / (shares[0] + shares[1]) * 100)))
-                                + '%)'
-                                + Style.NORMAL
-                                + Fore.RESET
-                                + ' ∙ '
-                                + Fore.BLUE
-                                + Style.BRIGHT
-                                + str(round(hashrate))
-                                + ' H/s'
-                                + Style.NORMAL
-                                + ' ('
-                                + computetime
-                                + ')'
-                                + Fore.RESET
-                                + ' ⚙ diff '
-                                + str(diff)
-                                + ' ∙ '
-                                + Fore.CYAN
-                                + 'ping '
-                                + str('%02.0f' % int(ping))
-                                + 'ms')
-
-                    elif feedback == 'BLOCK':
-                        # If block was found
-                        shares[0] += 1
-                        title(
-                            get_string('duco_avr_miner')
-                            + str(MINER_VER)
-                            + ') - '
-                            + str(shares[0])
-                            + '/'
-                            + str(shares[0] + shares[1])
-                            + get_string('accepted_shares'))
-                        with thread_lock:
-                            print(
-                                Style.RESET_ALL
-                                + Fore.WHITE
-                                + now().strftime(Style.DIM + '%H:%M:%S ')
-                                + Style.BRIGHT
-                                + Back.MAGENTA
-                                + Fore.RESET
-                                + ' usb'
-                                + str(''.join(filter(str.isdigit, com)))
-                                + ' '
-                                + Back.RESET
-                                + Fore.CYAN
-                                + ' ⛏'
-                                + get_string('block_found')
-                                + Fore.RESET
-                                + str(int(shares[0]))
-                                + '/'
-                                + str(int(shares[0] + shares[1]))
-                                + Fore.YELLOW
-                                + ' ('
-                                + str(int((shares[0]
-                                           / (shares[0] + shares[1]) * 100)))
-                                + '%)'
-                                + Style.NORMAL
-                                + Fore.RESET
-                                + ' ∙ '
-                                + Fore.BLUE
-                                + Style.BRIGHT
-                                + str(round(hashrate))
-                                + ' H/s'
-                                + Style.NORMAL
-                                + ' ('
-                                + computetime
-                                + ')'
-                                + Fore.RESET
-                                + ' ⚙ diff '
-                                + str(diff)
-                                + ' ∙ '
-                                + Fore.CYAN
-                                + 'ping '
-                                + str('%02.0f' % int(ping))
-                                + 'ms')
-
-                    else:
-                        # If result was incorrect
-                        shares[1] += 1
-                        title(
-                            get_string('duco_avr_miner')
-                            + str(MINER_VER)
-                            + ') - '
-                            + str(shares[0])
-                            + '/'
-                            + str(shares[0] + shares[1])
-                            + get_string('accepted_shares'))
-                        with thread_lock:
-                            print(
-                                Style.RESET_ALL
-                                + Fore.WHITE
-                                + now().strftime(Style.DIM + '%H:%M:%S ')
-                                + Style.BRIGHT
-                                + Back.MAGENTA
-                                + Fore.RESET
-                                + ' usb'
-                                + str(''.join(filter(str.isdigit, com)))
-                                + ' '
-                                + Back.RESET
-                                + Fore.RED
-                                + ' ✗'
-                                + get_string('rejected')
-                                + Fore.RESET
-                                + str(int(shares[0]))
-                                + '/'
-                                + str(int(shares[0] + shares[1]))
-                                + Fore.YELLOW
-                                + ' ('
-                                + str(int((shares[0]
-                                           / (shares[0] + shares[1]) * 100)))
-                                + '%)'
-                                + Style.NORMAL
-                                + Fore.RESET
-                                + ' ∙ '
-                                + Fore.BLUE
-                                + Style.BRIGHT
-                                + str(round(hashrate))
-                                + ' H/s'
-                                + Style.NORMAL
-                                + ' ('
-                                + computetime
-                                + ')'
-                                + Fore.RESET
-                                + ' ⚙ diff '
-                                + str(diff)
-                                + ' ∙ '
-                                + Fore.CYAN
-                                + 'ping '
-                                + str('%02.0f' % int(ping))
-                                + 'ms')
+                    journal_share(com, result, hashrate_t, feedback,
+                                  diff, time_delta * 1000)
+                    share_print(com, feedback, computetime, diff, ping)
 
                     end_time = time()
                     elapsed_time = end_time - start_time
@@ -1074,10 +1442,388 @@ def mine_avr(com, threadid):
                 + ' (main loop err: '
                 + str(e)
                 + ')',
-                'error')
+                'error', com=com)
             debug_output('Main loop error: ' + str(e))
 
 
+class AsyncSerial:
+    # Non-blocking serial port for the asyncio engine - waits for data
+    # with the event loop instead of a blocking read in its own thread
+    def __init__(self, com):
+        self.com = com
+        self.ser = Serial(com,
+                          baudrate=int(BAUDRATE),
+                          timeout=0)
+        self.buffer = bytearray()
+        try:
+            self.fd = self.ser.fileno()
+        except Exception:
+            # Windows ports have no file descriptor, poll them instead
+            self.fd = None
+
+    def write(self, data: bytes):
+        self.ser.write(data)
+
+    def close(self):
+        close_port(self.ser)
+
+    def healthy(self):
+        self.buffer = bytearray()
+        return port_healthy(self.ser)
+
+    async def wait_readable(self, timeout: float):
+        loop = asyncio.get_running_loop()
+        if self.fd is None:
+            await asyncio.sleep(min(timeout, 0.01))
+            return
+
+        readable = loop.create_future()
+        loop.add_reader(
+            self.fd,
+            lambda: readable.done() or readable.set_result(None))
+        try:
+            await asyncio.wait_for(readable, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            loop.remove_reader(self.fd)
+
+    async def readline(self, timeout: float):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while b'\n' not in self.buffer:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                # Not an OSError, a slow board doesn't need a reopen
+                raise Exception('No data received from the board')
+            await self.wait_readable(remaining)
+            self.buffer += self.ser.read(self.ser.in_waiting or 1)
+
+        line, _, rest = self.buffer.partition(b'\n')
+        self.buffer = bytearray(rest)
+        return line.decode().strip()
+
+
+async def open_board(com):
+    # Asyncio version of open_port
+    while True:
+        try:
+            debug_output(com + ': opening serial port')
+            return AsyncSerial(com)
+        except Exception as e:
+            pretty_print(
+                'usb'
+                + str(''.join(filter(str.isdigit, com))),
+                get_string('board_connection_error')
+                + str(com)
+                + get_string('board_connection_error2')
+                + Style.NORMAL
+                + Fore.RESET
+                + ' (port connection err: '
+                + str(e)
+                + ')',
+                'error', com=com)
+            count_serial_error(com)
+            await asyncio.sleep(10)
+
+
+async def mine_avr_async(com, threadid):
+    # Asyncio version of mine_avr, every board runs as a task
+    # of the same event loop
+    board = None
+    start_time = time()
+    report_shares, last_shares = 0, 0
+    usb = str(''.join(filter(str.isdigit, com)))
+    loop = asyncio.get_running_loop()
+    while True:
+        soc = socket()
+        try:
+            debug_output('Connecting to ' +
+                         str(NODE_ADDRESS + ":" + str(NODE_PORT)))
+            soc.setblocking(False)
+            await asyncio.wait_for(
+                loop.sock_connect(soc, (str(NODE_ADDRESS), int(NODE_PORT))),
+                SOC_TIMEOUT)
+            get_board_stats(com)['connections'] += 1
+            soc_reader = LineReader(soc)
+            server_version = await asyncio.wait_for(
+                soc_reader.read_any_async(), SOC_TIMEOUT)
+
+            if threadid == 0:
+                if float(server_version) <= float(MINER_VER):
+                    pretty_print(
+                        'net0',
+                        get_string('connected')
+                        + Style.NORMAL
+                        + Fore.RESET
+                        + get_string('connected_server')
+                        + str(server_version)
+                        + ")",
+                        'success')
+                else:
+                    pretty_print(
+                        'sys0',
+                        ' Miner is outdated (v'
+                        + MINER_VER
+                        + ') -'
+                        + get_string('server_is_on_version')
+                        + server_version
+                        + Style.NORMAL
+                        + Fore.RESET
+                        + get_string('update_warning'),
+                        'warning', com=com)
+                    await asyncio.sleep(10)
+
+            pretty_print(
+                'sys' + usb,
+                get_string('mining_start')
+                + Style.NORMAL
+                + Fore.RESET
+                + get_string('mining_algorithm')
+                + str(com)
+                + ')',
+                'success')
+
+            while True:
+                debug_output(com + ': requested job from the server')
+                await loop.sock_sendall(
+                    soc, bytes('JOB,' + str(username) + ',AVR',
+                               encoding='ascii'))
+                job = await asyncio.wait_for(
+                    soc_reader.readline_async(), SOC_TIMEOUT)
+                job = job.split(',')
+                debug_output('Received: ' + str(job))
+
+                try:
+                    diff = int(job[2])
+                except Exception:
+                    pretty_print('usb' + usb,
+                                 ' Node message: ' + job[-1],
+                                 'warning', com=com)
+                    await asyncio.sleep(3)
+                    continue
+
+                while True:
+                    result = None
+                    for retry_counter in range(3):
+                        if board is None or not board.healthy():
+                            # The port is kept open between jobs and
+                            # only (re)opened after an I/O error
+                            if board:
+                                board.close()
+                            board = await open_board(com)
+
+                        try:
+                            debug_output(com + ': sending job to AVR')
+                            board.write(bytes(
+                                job[0] + ',' + job[1]
+                                + ',' + job[2] + ',',
+                                encoding='ascii'))
+                            result = await board.readline(
+                                float(AVR_TIMEOUT))
+                            if '\x00' in result or not result:
+                                raise Exception('Empty data received')
+                            result = result.split(',')
+                            if result[0] and result[1]:
+                                break
+                        except Exception as e:
+                            debug_output(com
+                                         + ': retrying reading data: '
+                                         + str(e))
+                            count_serial_error(com)
+                            if isinstance(e, OSError):
+                                board.close()
+                                board = None
+
+                    try:
+                        computetime, hashrate_t, chipID = (
+                            process_result(com, result))
+                        break
+                    except Exception as e:
+                        pretty_print(
+                            'usb' + usb,
+                            get_string('mining_avr_connection_error')
+                            + Style.NORMAL
+                            + Fore.RESET
+                            + ' (error reading result from the board: '
+                            + str(e)
+                            + ', please check connection '
+                            + 'and port setting)',
+                            'warning', com=com)
+                        await asyncio.sleep(1)
+
+                await loop.sock_sendall(soc, bytes(
+                    str(result[0])
+                    + ','
+                    + str(hashrate_t)
+                    + ',Official AVR Miner v'
+                    + str(MINER_VER)
+                    + ','
+                    + str(rig_identifier)
+                    + ','
+                    + str(chipID),
+                    encoding='ascii'))
+
+                responsetimetart = now()
+                feedback = await asyncio.wait_for(
+                    soc_reader.readline_async(), SOC_TIMEOUT)
+                responsetimestop = now()
+                time_delta = (responsetimestop -
+                              responsetimetart).total_seconds()
+                ping_stats = get_board_stats(com)['ping']
+                ping_stats.add(round(time_delta * 1000))
+                get_board_stats(com)['latency'].observe(time_delta)
+                ping = ping_stats.mean()
+                debug_output(com + ': feedback: '
+                             + str(feedback)
+                             + ' with ping: '
+                             + str(ping))
+
+                journal_share(com, result, hashrate_t, feedback,
+                              diff, time_delta * 1000)
+                share_print(com, feedback, computetime, diff, ping)
+
+                end_time = time()
+                elapsed_time = end_time - start_time
+                if (threadid == 0
+                        and elapsed_time >= PERIODIC_REPORT_TIME):
+                    report_shares = shares[0] - last_shares
+                    uptime = calculate_uptime(mining_start_time)
+                    periodic_report(start_time,
+                                    end_time,
+                                    report_shares,
+                                    hashrate,
+                                    uptime)
+                    start_time = time()
+                    last_shares = shares[0]
+
+        except Exception as e:
+            pretty_print(
+                'net' + usb,
+                get_string('connecting_error')
+                + Style.NORMAL
+                + ' (main loop err: '
+                + str(e)
+                + ')',
+                'error', com=com)
+            debug_output(com + ': main loop error: ' + str(e))
+            try:
+                soc.close()
+            except Exception:
+                pass
+            await asyncio.sleep(10)
+
+
+async def mine_avr_all(ports):
+    # Drive every board from a single event loop
+    await asyncio.gather(*[mine_avr_async(port, threadid)
+                           for threadid, port in enumerate(ports)])
+
+
+def metrics_text():
+    # Prometheus text format of the per-board statistics
+    lines = []
+
+    def escape(value):
+        # Backslash, double quote and newline are escaped in label values
+        return (str(value).replace('\\', '\\\\')
+                .replace('"', '\\"').replace('\n', '\\n'))
+
+    def sample(name, value, labels):
+        lines.append(name
+                     + '{'
+                     + ','.join(key + '="' + escape(val) + '"'
+                                for key, val in labels.items())
+                     + '} '
+                     + repr(float(value)))
+
+    def header(name, kind, help):
+        lines.append('# HELP ' + name + ' ' + help)
+        lines.append('# TYPE ' + name + ' ' + kind)
+
+    boards = sorted(board_stats.items())
+    header('duco_miner_info', 'gauge', 'Miner version and settings')
+    sample('duco_miner_info', 1, {'version': MINER_VER,
+                                  'identifier': rig_identifier})
+    for name, key, kind, help in [
+            ('duco_shares_accepted_total', 'accepted', 'counter',
+             'Shares accepted by the node'),
+            ('duco_shares_rejected_total', 'rejected', 'counter',
+             'Shares rejected by the node'),
+            ('duco_blocks_total', 'blocks', 'counter',
+             'Blocks found'),
+            ('duco_difficulty', 'difficulty', 'gauge',
+             'Difficulty of the last job'),
+            ('duco_connections_total', 'connections', 'counter',
+             'Pool connections opened, reconnects included'),
+            ('duco_serial_errors_total', 'serial_errors', 'counter',
+             'Failed serial port opens, writes and reads')]:
+        header(name, kind, help)
+        for com, stats in boards:
+            sample(name, stats[key], {'board': com})
+
+    header('duco_hashrate_hashes_per_second', 'gauge',
+           'Rolling mean hashrate')
+    for com, stats in boards:
+        sample('duco_hashrate_hashes_per_second',
+               stats['hashrate'].mean(), {'board': com})
+
+    for name, key, help in [
+            ('duco_share_latency_seconds', 'latency',
+             'Time between submitting a share and the node\'s reply'),
+            ('duco_compute_time_seconds', 'compute_time',
+             'Time the board spent solving a job')]:
+        header(name, 'histogram', help)
+        for com, stats in boards:
+            histogram = stats[key]
+            for upper_bound, count in zip(histogram.buckets,
+                                          histogram.cumulative()):
+                sample(name + '_bucket', count,
+                       {'board': com, 'le': upper_bound})
+            sample(name + '_bucket', histogram.count,
+                   {'board': com, 'le': '+Inf'})
+            sample(name + '_count', histogram.count, {'board': com})
+            sample(name + '_sum', histogram.sum, {'board': com})
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    # Serves metrics_text() on /metrics
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = metrics_text().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type',
+                         'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics(port):
+    # Embedded Prometheus endpoint on a background thread
+    try:
+        server = ThreadingHTTPServer(('', port), MetricsHandler)
+    except OSError as e:
+        pretty_print('sys0',
+                     ' Can\'t start the metrics endpoint on port '
+                     + str(port) + ': ' + str(e),
+                     'error')
+        return
+    thrThread(target=server.serve_forever, daemon=True).start()
+    pretty_print('sys0',
+                 ' Metrics available at '
+                 + Style.NORMAL
+                 + Fore.RESET
+                 + 'http://0.0.0.0:' + str(port) + '/metrics',
+                 'success')
+
+
 def periodic_report(start_time,
                     end_time,
                     shares,
@@ -1105,6 +1851,32 @@ def periodic_report(start_time,
                  + get_string('total_mining_time')
                  + str(uptime), "success")
 
+    for com, stats in sorted(list(board_stats.items())):
+        pretty_print('usb'
+                     + str(''.join(filter(str.isdigit, com))),
+                     ' '
+                     + str(com)
+                     + Style.NORMAL
+                     + Fore.RESET
+                     + ' ∙ '
+                     + str(round(stats['hashrate'].mean()))
+                     + ' H/s (p50 '
+                     + str(round(stats['hashrate'].percentile(50)))
+                     + ', p95 '
+                     + str(round(stats['hashrate'].percentile(95)))
+                     + ', min '
+                     + str(round(stats['hashrate'].min()))
+                     + ', max '
+                     + str(round(stats['hashrate'].max()))
+                     + ') ∙ ping '
+                     + str(round(stats['ping'].mean()))
+                     + 'ms (p50 '
+                     + str(round(stats['ping'].percentile(50)))
+                     + ', p95 '
+                     + str(round(stats['ping'].percentile(95)))
+                     + ')',
+                     'success')
+
 
 def calculate_uptime(start_time):
     uptime = time() - start_time
@@ -1121,6 +1893,11 @@ def calculate_uptime(start_time):
 
 
 def fetch_pools():
+    # DUCO_NODE=host:port skips the pool API, e.g. for a local mock node
+    if environ.get('DUCO_NODE'):
+        NODE_ADDRESS, NODE_PORT = environ['DUCO_NODE'].rsplit(':', 1)
+        return NODE_ADDRESS, int(NODE_PORT)
+
     while True:
         pretty_print("net0",
                      " "
@@ -1192,14 +1969,29 @@ if __name__ == '__main__':
         NODE_PORT = 2813
         debug_output("Using default server port and address")
 
+    if metrics_port:
+        start_metrics(metrics_port)
+
+    if journal_path:
+        start_journal()
+
+    if dashboard == 'y':
+        start_dashboard()
+
     try:
-        # Launch avr duco mining threads
-        threadid = 0
-        for port in avrport:
+        if engine == 'asyncio':
+            # One event loop driving all of the boards
             thrThread(
-                target=mine_avr,
-                args=(port, threadid)).start()
-            threadid += 1
+                target=asyncio.run,
+                args=(mine_avr_all(avrport),)).start()
+        else:
+            # Launch avr duco mining threads
+            threadid = 0
+            for port in avrport:
+                thrThread(
+                    target=mine_avr,
+                    args=(port, threadid)).start()
+                threadid += 1
     except Exception as e:
         debug_output('Error launching AVR thread(s): ' + str(e))
 
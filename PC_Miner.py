@@ -6,31 +6,50 @@ https://github.com/revoxhere/duino-coin
 Duino-Coin Team & Community 2019-2021
 """
 
-from time import time, sleep, strptime, ctime
+from time import time, sleep, strptime, ctime, perf_counter
+
+# Origin of the --profile-startup timings: taken before the other
+# imports, so "module load" covers them too (optional modules and the
+# ones only the broker or metrics use are timed when first needed)
+STARTUP_TIME = perf_counter()
+
 from hashlib import sha1
-from socket import socket
+from socket import socket, create_connection
+from socket import SOL_SOCKET, SO_ERROR, SO_KEEPALIVE
+from socket import IPPROTO_TCP, TCP_NODELAY
+import socket as sockets
+from select import select
 
-from multiprocessing import Lock as thread_lock
 from multiprocessing import cpu_count, current_process
-from multiprocessing import Process, Manager
-from threading import Thread
+from multiprocessing import Process, Value, Array, Queue, Pipe
+from multiprocessing.connection import wait as wait_ready
+from threading import Thread, Lock, Event
+from queue import Queue as LocalQueue
+from queue import Empty, Full
 from datetime import datetime
 
 from os import execl, mkdir, _exit
 from subprocess import DEVNULL, Popen, check_call
-import pip
+from importlib import import_module
+from importlib.util import find_spec
 import sys
 import os
 import json
+import ctypes
 
-import requests
 from pathlib import Path
+import gzip
+import shutil
 from re import sub
-from random import choice
+from random import choice, uniform
+from itertools import repeat
+from collections import deque
+from math import log
 
 from signal import SIGINT, signal
 from locale import LC_ALL, getdefaultlocale, getlocale, setlocale
 from configparser import ConfigParser
+from argparse import ArgumentParser
 configparser = ConfigParser()
 
 
@@ -45,8 +64,12 @@ def handler(signal_received, frame):
             + Fore.RESET
             + get_string("goodbye"),
             "warning")
-    for p in p_list:
-        p.terminate()
+        Console.close()
+        for p in p_list:
+            # None while a worker waits out its restart backoff
+            if p:
+                p.terminate()
+    Journal.close()
     _exit(0)
 
 
@@ -55,6 +78,7 @@ def install(package):
     Automatically installs python pip package and restarts the program
     """
     try:
+        import pip
         pip.main(["install",  package])
     except AttributeError:
         check_call([sys.executable, '-m', 'pip', 'install', package])
@@ -62,52 +86,138 @@ def install(package):
     execl(sys.executable, sys.executable, *sys.argv)
 
 
-try:
-    from xxhash import xxh64
-    xxhash_en = True
-except ModuleNotFoundError:
+# Xxhash itself is only imported by the workers that mine with it
+xxhash_en = find_spec("xxhash") is not None
+if not xxhash_en:
     print("Xxhash is not installed - this mining algorithm will be disabled")
-    xxhash_en = False
-
-try:
-    from colorama import Back, Fore, Style, init
-    init(autoreset=True)
-except ModuleNotFoundError:
-    print("Colorama is not installed. "
-          + "Miner will try to automatically install it "
-          + "If it fails, please manually execute "
-          + "python3 -m pip install colorama")
-    install("colorama")
-
-try:
-    import cpuinfo
-    cpu = cpuinfo.get_cpu_info()
-except ModuleNotFoundError:
-    print("Cpuinfo is not installed. "
-          + "Miner will try to automatically install it "
-          + "If it fails, please manually execute "
-          + "python3 -m pip install py-cpuinfo")
-    install("py-cpuinfo")
-
-
-try:
-    from pypresence import Presence
-except ModuleNotFoundError:
-    print("Pypresence is not installed. "
-          + "Miner will try to automatically install it "
-          + "If it fails, please manually execute "
-          + "python3 -m pip install pypresence")
-    install("pypresence")
-
-
-try:
-    import psutil
-except ModuleNotFoundError:
-    print("Psutil is not installed. "
-          + "Miner will try to automatically install it "
-          + "If it fails, please manually execute "
-          + "python3 -m pip install psutil")
-    install("psutil")
+
+# Headless mode never prompts, colors its output or fetches anything
+# before mining - everything comes from argv, env and an optional config
+HEADLESS = ("--headless" in sys.argv
+            or os.environ.get("DUCO_HEADLESS", "n").lower()
+            in ("1", "y", "yes", "true"))
+
+if HEADLESS:
+    class Plain:
+        """
+        Stands in for colorama's Fore, Back and Style in headless mode
+        """
+
+        def __getattr__(self, name):
+            return ""
+
+    Fore = Back = Style = Plain()
+else:
+    try:
+        from colorama import Back, Fore, Style, init
+        init(autoreset=True)
+    except ModuleNotFoundError:
+        print("Colorama is not installed. "
+              + "Miner will try to automatically install it "
+              + "If it fails, please manually execute "
+              + "python3 -m pip install colorama")
+        install("colorama")
+
+PROFILE_STARTUP = "--profile-startup" in sys.argv
+
+
+class Lazy:
+    """
+    The heavier dependencies (requests, psutil, pypresence, cpuinfo,
+    xxhash, and asyncio and http.server of the standard library) are
+    imported on first use instead of at startup, so spawned workers
+    only load what they need
+    """
+    PACKAGES = {"cpuinfo": "py-cpuinfo"}
+    modules = {}
+    cpu_name = None
+
+    def module(name: str):
+        """
+        Imports a module once, installing its package if it's missing
+        """
+        if name not in Lazy.modules:
+            start = perf_counter()
+            try:
+                Lazy.modules[name] = import_module(name)
+            except ModuleNotFoundError:
+                package = Lazy.PACKAGES.get(name, name)
+                print(name.capitalize() + " is not installed. "
+                      + "Miner will try to automatically install it "
+                      + "If it fails, please manually execute "
+                      + "python3 -m pip install " + package)
+                install(package)
+            Startup.add("import " + name, start)
+        return Lazy.modules[name]
+
+    def xxh64_intdigest():
+        xxhash = Lazy.module("xxhash")
+        if hasattr(xxhash, "xxh64_intdigest"):
+            return xxhash.xxh64_intdigest
+        return lambda data, seed=0: xxhash.xxh64(data, seed=seed).intdigest()
+
+    def cpu():
+        """
+        Returns the CPU name, read from /proc/cpuinfo when possible
+        because a full cpuinfo probe takes a second or more
+        """
+        if not Lazy.cpu_name:
+            try:
+                with open("/proc/cpuinfo") as cpuinfo:
+                    for line in cpuinfo:
+                        if line.startswith("model name"):
+                            Lazy.cpu_name = line.split(":", 1)[1].strip()
+                            break
+            except OSError:
+                pass
+        if not Lazy.cpu_name:
+            Lazy.cpu_name = Lazy.module(
+                "cpuinfo").get_cpu_info()["brand_raw"]
+        return Lazy.cpu_name
+
+
+class Startup:
+    """
+    Import and init costs shown by --profile-startup
+    """
+    steps = []
+    last = STARTUP_TIME
+
+    def add(step: str, start: float):
+        Startup.steps.append((step, perf_counter() - start))
+
+    def mark(step: str):
+        """
+        Records the time spent since the previous mark
+        """
+        Startup.add(step, Startup.last)
+        Startup.last = perf_counter()
+
+    def show(step: str, duration: float, sender: str = "sys0"):
+        if HEADLESS:
+            Headless.log("startup", step=step,
+                         ms=round(duration * 1000, 1))
+        else:
+            pretty_print("Startup: " + Fore.RESET + Style.NORMAL + step
+                         + " " + Fore.YELLOW
+                         + str(round(duration * 1000, 1)) + "ms",
+                         "success", sender)
+
+    def report():
+        if not PROFILE_STARTUP:
+            return
+        for step, duration in Startup.steps:
+            Startup.show(step, duration)
+        Startup.show("total", perf_counter() - STARTUP_TIME)
+
+    def worker_ready(id: int):
+        """
+        Time from the start of this process (or of the parent, for forked
+        workers) until the worker is ready to hash
+        """
+        if PROFILE_STARTUP:
+            Startup.show("worker " + str(id) + " ready",
+                         perf_counter() - STARTUP_TIME, "sys" + str(id))
 
 
 class Settings:
@@ -124,6 +234,8 @@ class Settings:
                     + "PC_Miner_langs.json")
     TRANSLATIONS_FILE = "/Translations.json"
     SETTINGS_FILE = "/Settings.cfg"
+    KERNEL_DIR = "PC_Miner_Kernel"
+    KERNEL_NAMES = ["libducos1.so", "libducos1.dylib", "ducos1.dll"]
 
     SOC_TIMEOUT = 15
     REPORT_TIME = 50
@@ -144,86 +256,871 @@ class Algorithms:
     For more info about the implementation refer to the Duino whitepaper:
     https://github.com/revoxhere/duino-coin/blob/gh-pages/assets/whitepaper.pdf
     """
-    def DUCOS1(last_h: str, exp_h: str, diff: int, eff: int):
+    NONCE_BLOCK = 1_000
+    HEAD_SUFFIXES = [str(i).encode("ascii") for i in range(NONCE_BLOCK)]
+    SUFFIXES = [str(i).zfill(3).encode("ascii") for i in range(NONCE_BLOCK)]
+
+    def nonce_blocks(max_nonce: int, start: int = 0, step: int = 1):
+        """
+        Splits range(max_nonce + 1) into blocks of NONCE_BLOCK nonces
+        sharing the same decimal prefix (1230000-1230999 all start
+        with "1230"), yields (prefix, first_nonce, suffixes) so the
+        prefix only has to be hashed once per block.
+        Only every step-th block from start is yielded, so the
+        members of a Team can interleave the same job
+        """
+        last_block = max_nonce // Algorithms.NONCE_BLOCK
+        for block in range(start, last_block + 1, step):
+            if block == 0:
+                yield (b"", 0,
+                       Algorithms.HEAD_SUFFIXES[:max_nonce + 1])
+                continue
+
+            suffixes = Algorithms.SUFFIXES
+            if block == last_block:
+                suffixes = suffixes[:max_nonce % Algorithms.NONCE_BLOCK + 1]
+            yield (str(block).encode("ascii"),
+                   block * Algorithms.NONCE_BLOCK,
+                   suffixes)
+
+    def result(nonce: int, hashes: int, time_start: float, found=None):
+        """
+        Returns [nonce, hashrate] - a nonce of -1 means it wasn't in
+        the searched blocks. In a Team the nonce is published in the
+        shared found value, or taken from it if a member found it
+        """
+        if found is not None:
+            if nonce >= 0:
+                found.value = nonce
+            else:
+                nonce = found.value
+        hashrate = hashes / max(time() - time_start, 1e-6)
+        return [max(nonce, 0), hashrate]
+
+    def DUCOS1(last_h: str, exp_h: str, diff: int,
+               governor=None, start=0, step=1, found=None):
         time_start = time()
         base_hash = sha1(last_h.encode('ascii'))
+        try:
+            target = bytes.fromhex(exp_h)
+        except ValueError:
+            return [0, 0]
+
+        hashes = 0
+        for prefix, first_nonce, suffixes in Algorithms.nonce_blocks(
+                100 * diff, start, step):
+            if governor:
+                governor.tick()
+            if found is not None and found.value >= 0:
+                break
+
+            prefix_h = base_hash.copy()
+            prefix_h.update(prefix)
+            copy = prefix_h.copy
+
+            for i, suffix in enumerate(suffixes):
+                temp_h = copy()
+                temp_h.update(suffix)
+
+                if temp_h.digest() == target:
+                    return Algorithms.result(first_nonce + i, hashes + i,
+                                             time_start, found)
+            hashes += len(suffixes)
+
+        return Algorithms.result(-1, hashes, time_start, found)
+
+    def XXHASH(last_h: str, exp_h: str, diff: int,
+               governor=None, start=0, step=1, found=None):
+        """
+        Hashes whole nonce blocks at once - candidates are built and
+        fed to xxh64_intdigest by map() so the per-nonce work stays in C,
+        the 64-bit results are compared as integers
+        """
+        time_start = time()
+        base = last_h.encode('ascii')
+        try:
+            target = int(exp_h, 16)
+        except ValueError:
+            return [0, 0]
+        seeds = repeat(2811)
+        intdigest = Lazy.xxh64_intdigest()
+
+        hashes = 0
+        for prefix, first_nonce, suffixes in Algorithms.nonce_blocks(
+                100 * diff, start, step):
+            if governor:
+                governor.tick()
+            if found is not None and found.value >= 0:
+                break
 
-        for nonce in range(100 * diff + 1):
-            if (int(eff) != 100
-                    and nonce % (1_000 * int(eff)) == 0):
-                if psutil.cpu_percent() > int(eff):
-                    sleep(1/100*int(eff))
+            candidates = map((base + prefix).__add__, suffixes)
+            digests = list(map(intdigest, candidates, seeds))
 
-            temp_h = base_hash.copy()
-            temp_h.update(str(nonce).encode('ascii'))
-            d_res = temp_h.hexdigest()
+            if target in digests:
+                i = digests.index(target)
+                return Algorithms.result(first_nonce + i, hashes + i,
+                                         time_start, found)
+            hashes += len(suffixes)
 
-            if d_res == exp_h:
-                time_elapsed = time() - time_start
-                hashrate = nonce / time_elapsed
-                return [nonce, hashrate]
+        return Algorithms.result(-1, hashes, time_start, found)
+
+
+class Governor:
+    """
+    Duty-cycle throttle used when intensity is below 100%.
+    Each worker hashes for a SLICE and then sleeps long enough to be busy
+    only `duty` of the time. The duty lives in shared memory and is tuned
+    by a single sampler thread in the main process, so workers never
+    have to measure the CPU usage themselves.
+    Every tick is also the worker's heartbeat for the Supervisor -
+    workers beat while hashing, when a job arrives and every IDLE_POLL
+    while idle on purpose (see wait), the waits on other processes
+    that may never answer are bounded instead
+    """
+    SLICE = 0.1
+    SAMPLE_TIME = 3
+    MIN_DUTY = 0.01
+    IDLE_POLL = 1
+
+    def __init__(self, duty, stats=None, id: int = 0):
+        self.duty = duty
+        self.stats = stats
+        self.id = id
+        self.slice_start = time()
+
+    def create(intensity: int):
+        """
+        Returns the shared duty value for the given intensity
+        """
+        return Value("d", min(max(intensity, 1), 100) / 100, lock=False)
 
-        return [0, 0]
+    def beat(self):
+        if self.stats is not None:
+            Stats.set(self.stats, self.id, Stats.HEARTBEAT, time())
 
-    def XXHASH(last_h: str, exp_h: str, diff: int,  eff: int):
+    def reset(self):
+        """
+        Called by the job loops when a job starts - begins a new slice,
+        so the time spent waiting for the job isn't counted as busy time.
+        A job arriving is progress too, so it's also a heartbeat
+        """
+        self.slice_start = time()
+        self.beat()
+
+    def wait(self, connection):
+        """
+        Receives the next job from a pipe - a team member waiting for
+        its leader or a brokered worker without a free pool connection
+        is idle by design, so it keeps beating meanwhile
+        """
+        while not connection.poll(Governor.IDLE_POLL):
+            self.beat()
+        return connection.recv()
+
+    def tick(self):
+        """
+        Called by the algorithms between nonce blocks
+        """
+        self.beat()
+        duty = self.duty.value
+        if duty >= 1:
+            return
+
+        busy = time() - self.slice_start
+        if busy >= Governor.SLICE:
+            sleep(busy * (1 - duty) / duty)
+            self.slice_start = time()
+
+    def sampler(duty, intensity: int):
+        """
+        Main process thread nudging the duty so that the total CPU usage
+        settles at the configured intensity
+        """
+        while True:
+            usage = Lazy.module("psutil").cpu_percent(
+                interval=Governor.SAMPLE_TIME)
+            if usage <= 0:
+                continue
+            correction = min(max(intensity / usage, 0.5), 1.5)
+            duty.value = min(max(duty.value * correction,
+                                 Governor.MIN_DUTY), 1)
+
+
+class Difficulty:
+    """
+    Adaptive difficulty, enabled with adaptive_diff = y. Solving a job
+    takes 50 * diff hashes on average, so from the measured hashrate and
+    ping the expected share time of every tier is known - the closest
+    one to target_share_time is requested. Longer shares amortize the
+    round trips to the node, shorter ones lose less work on disconnects
+    """
+    TIERS = ["LOW", "MEDIUM", "NET"]
+    # Replaced by the real difficulties once a tier has been mined
+    GUESSES = {"LOW": 1_500, "MEDIUM": 15_000, "NET": 50_000}
+    ALPHA = 0.2
+    MIN_SHARES = 5
+    HYSTERESIS = log(1.5)
+
+    def __init__(self, user_settings, id: int):
+        self.id = id
+        self.tier = str(user_settings["start_diff"]).upper()
+        self.adaptive = (user_settings.get("adaptive_diff", "n") == "y"
+                         and self.tier in Difficulty.TIERS)
+        self.target = float(user_settings.get("target_share_time", 15))
+        self.diffs = dict(Difficulty.GUESSES)
+        self.hashrate = 0
+        self.ping = 0
+        self.shares = 0
+
+    def error(self, tier: str):
+        """
+        Distance of the tier's expected share time from the target,
+        in log scale so that 2x too long equals 2x too short
+        """
+        expected = 50 * self.diffs[tier] / self.hashrate + self.ping
+        return abs(log(expected / self.target))
+
+    def update(self, diff: int, hashrate: float, ping: float):
+        """
+        Called after every share with the job difficulty,
+        the worker's hashrate and the ping in seconds
+        """
+        if not self.adaptive or hashrate <= 0:
+            return
+
+        self.diffs[self.tier] = diff
+        if self.hashrate:
+            self.hashrate += Difficulty.ALPHA * (hashrate - self.hashrate)
+            self.ping += Difficulty.ALPHA * (ping - self.ping)
+        else:
+            self.hashrate, self.ping = hashrate, ping
+
+        self.shares += 1
+        if self.shares < Difficulty.MIN_SHARES:
+            return
+
+        best = min(Difficulty.TIERS, key=self.error)
+        if self.error(self.tier) - self.error(best) > Difficulty.HYSTERESIS:
+            pretty_print("Switching to " + best + " difficulty"
+                         + Fore.RESET + Style.NORMAL
+                         + " (expected share time "
+                         + str(round(50 * self.diffs[best] / self.hashrate
+                                     + self.ping, 1))
+                         + "s, target " + str(self.target) + "s)",
+                         "warning", "sys" + str(self.id))
+            self.tier = best
+            self.shares = 0
+
+
+class Stats:
+    """
+    Per-worker statistics in a single shared memory block with one row
+    of ROW doubles per worker. Each worker only writes its own row, so
+    there are no locks or manager round-trips - readers sum the rows.
+    The scalar fields are followed by the histograms, each stored as
+    per-bucket counts, the observation count and the sum
+    """
+    ACCEPT = 0
+    REJECT = 1
+    HASHRATE = 2
+    LAST_SHARE = 3
+    DIFF = 4
+    CONNECTS = 5
+    HEARTBEAT = 6
+    RESTARTS = 7
+    FIELDS = 8
+
+    PING_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+    COMPUTE_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80)
+    PING_HIST = FIELDS
+    COMPUTE_HIST = PING_HIST + len(PING_BUCKETS) + 2
+    ROW = COMPUTE_HIST + len(COMPUTE_BUCKETS) + 2
+
+    def create(workers: int):
+        return Array("d", workers * Stats.ROW, lock=False)
+
+    def add(stats, id: int, field: int, value: float = 1):
+        stats[id * Stats.ROW + field] += value
+
+    def set(stats, id: int, field: int, value: float):
+        stats[id * Stats.ROW + field] = value
+
+    def get(stats, id: int, field: int):
+        return stats[id * Stats.ROW + field]
+
+    def total(stats, field: int):
+        return sum(stats[field::Stats.ROW])
+
+    def observe(stats, id: int, hist: int, buckets: tuple, value: float):
+        base = id * Stats.ROW + hist
+        for bucket, upper_bound in enumerate(buckets):
+            if value <= upper_bound:
+                stats[base + bucket] += 1
+                break
+        stats[base + len(buckets)] += 1
+        stats[base + len(buckets) + 1] += value
+
+    def histogram(stats, id: int, hist: int, buckets: tuple):
+        """
+        Returns (cumulative bucket counts, count, sum) of a histogram
+        """
+        base = id * Stats.ROW + hist
+        counts, running = [], 0
+        for bucket in range(len(buckets)):
+            running += stats[base + bucket]
+            counts.append(running)
+        return (counts, stats[base + len(buckets)],
+                stats[base + len(buckets) + 1])
+
+
+class Kernel:
+    """
+    Optional native DUCO-S1 kernel (see PC_Miner_Kernel/ducos1.c),
+    loaded with ctypes which releases the GIL for the whole search
+    """
+    CHUNK = 100_000
+    lib = None
+
+    def load():
+        """
+        Looks for a compiled kernel next to the miner, in the kernel
+        source folder and in the data dir, returns True if one was loaded
+        """
+        if Kernel.lib:
+            return True
+
+        script_dir = Path(__file__).resolve().parent
+        search_dirs = [script_dir,
+                       script_dir / Settings.KERNEL_DIR,
+                       Path(Settings.DATA_DIR)]
+        for directory in search_dirs:
+            for name in Settings.KERNEL_NAMES:
+                if not (directory / name).is_file():
+                    continue
+                try:
+                    lib = ctypes.CDLL(str(directory / name))
+                    lib.ducos1_search.restype = ctypes.c_int64
+                    lib.ducos1_search.argtypes = [ctypes.c_char_p,
+                                                  ctypes.c_size_t,
+                                                  ctypes.c_char_p,
+                                                  ctypes.c_uint64,
+                                                  ctypes.c_uint64]
+                    Kernel.lib = lib
+                    return True
+                except (OSError, AttributeError):
+                    continue
+        return False
+
+    def DUCOS1(last_h: str, exp_h: str, diff: int,
+               governor=None, start=0, step=1, found=None):
+        """
+        Same contract as Algorithms.DUCOS1, the nonce loop runs natively
+        in chunks so the governor still gets to run between them.
+        Team members interleave whole chunks
+        """
         time_start = time()
+        last_h = last_h.encode('ascii')
+        try:
+            target = bytes.fromhex(exp_h)
+        except ValueError:
+            return [0, 0]
+        if len(target) != 20:
+            return [0, 0]
+
+        max_nonce = 100 * diff
+        hashes = 0
+        for first in range(start * Kernel.CHUNK, max_nonce + 1,
+                           step * Kernel.CHUNK):
+            if governor:
+                governor.tick()
+            if found is not None and found.value >= 0:
+                break
+
+            end = min(first + Kernel.CHUNK - 1, max_nonce)
+            nonce = Kernel.lib.ducos1_search(last_h, len(last_h),
+                                             target, first, end)
+            if nonce >= 0:
+                return Algorithms.result(nonce, hashes + nonce - first,
+                                         time_start, found)
+            hashes += end - first + 1
+
+        return Algorithms.result(-1, hashes, time_start, found)
+
+
+class Planner:
+    """
+    Plans the worker processes from the CPU topology in /sys -
+    workers are spread over NUMA nodes and physical cores first and
+    only then over their hyper-threading siblings
+    """
+    SYS_CPU = "/sys/devices/system/cpu"
+    SYS_NODE = "/sys/devices/system/node"
+
+    def parse_cpu_list(cpu_list: str):
+        """
+        "0-3,8,10-11" => [0, 1, 2, 3, 8, 10, 11]
+        """
+        cpus = []
+        for part in cpu_list.replace(" ", "").split(","):
+            if not part:
+                continue
+            if "-" in part:
+                first, last = part.split("-")
+                cpus.extend(range(int(first), int(last) + 1))
+            else:
+                cpus.append(int(part))
+        return cpus
+
+    def read_sys(path: str):
+        try:
+            with open(path) as file:
+                return file.read().strip()
+        except OSError:
+            return None
+
+    def available_cpus():
+        """
+        Logical CPUs this process is allowed to run on
+        """
+        if hasattr(os, "sched_getaffinity"):
+            return sorted(os.sched_getaffinity(0))
+        return list(range(cpu_count()))
+
+    def topology():
+        """
+        Returns {cpu: (numa node, package, core)} for the available CPUs,
+        CPUs without topology info are treated as separate cores
+        """
+        nodes = {}
+        for node_dir in Path(Planner.SYS_NODE).glob("node[0-9]*"):
+            cpu_list = Planner.read_sys(str(node_dir / "cpulist"))
+            for cpu in Planner.parse_cpu_list(cpu_list or ""):
+                nodes[cpu] = int(node_dir.name[4:])
+
+        topology = {}
+        for cpu in Planner.available_cpus():
+            cpu_dir = Planner.SYS_CPU + "/cpu" + str(cpu) + "/topology/"
+            package = Planner.read_sys(cpu_dir + "physical_package_id")
+            core = Planner.read_sys(cpu_dir + "core_id")
+            topology[cpu] = (nodes.get(cpu, 0),
+                             int(package) if package else 0,
+                             int(core) if core else cpu)
+        return topology
+
+    def order():
+        """
+        Logical CPUs ordered so that consecutive workers land on
+        different NUMA nodes and physical cores before sharing a core
+        """
+        cores = {}
+        for cpu, core in sorted(Planner.topology().items()):
+            cores.setdefault(core, []).append(cpu)
+
+        by_node = {}
+        for core in sorted(cores):
+            by_node.setdefault(core[0], []).append(cores[core])
+
+        ordered = []
+        for sibling in range(max(len(c) for c in cores.values())):
+            node_lists = [[core[sibling] for core in node_cores
+                           if sibling < len(core)]
+                          for node_cores in by_node.values()]
+            for i in range(max(len(cpus) for cpus in node_lists)):
+                for cpus in node_lists:
+                    if i < len(cpus):
+                        ordered.append(cpus[i])
+        return ordered
+
+    def describe():
+        """
+        Returns (physical cores, logical cpus, NUMA nodes)
+        """
+        topology = Planner.topology()
+        return (len(set(topology.values())),
+                len(topology),
+                len(set(core[0] for core in topology.values())))
 
-        for nonce in range(100 * diff + 1):
-            if (int(eff) != 100
-                    and nonce % (1_000 * int(eff)) == 0):
-                if psutil.cpu_percent() > int(eff):
-                    sleep(1/100/int(eff))
+    def plan(threads: int, affinity: str = "auto"):
+        """
+        Returns a list with the set of CPUs for every worker
+        (None if the worker shouldn't be pinned). Affinity can be
+        "auto", "none" or an explicit cpu list like "0-7,16-23"
+        """
+        affinity = str(affinity).strip().lower()
+        if (affinity == "none"
+                or not hasattr(os, "sched_setaffinity")):
+            return [None] * threads
 
-            d_res = xxh64(last_h + str(nonce),
-                          seed=2811).hexdigest()
+        if affinity == "auto":
+            cpus = Planner.order()
+        else:
+            cpus = Planner.parse_cpu_list(affinity)
 
-            if d_res == exp_h:
-                time_elapsed = time() - time_start
-                hashrate = nonce / time_elapsed
-                return [nonce, hashrate]
+        if not cpus:
+            return [None] * threads
+        return [{cpus[i % len(cpus)]} for i in range(threads)]
 
-        return [0, 0]
+    def pin(cpus):
+        """
+        Pins the calling process to the planned CPUs
+        """
+        if not cpus:
+            return
+        try:
+            os.sched_setaffinity(0, cpus)
+        except (OSError, ValueError):
+            pass
 
 
 class Client:
     """
     Class helping to organize socket connections
     """
-    def connect(pool: tuple):
-        global s
-        s = socket()
-        s.connect((pool))
+    def fetch_pool():
+        """
+        Returns the node suggested by the /getPool API endpoint,
+        None if it can't be reached
+        """
+        try:
+            response = Lazy.module("requests").get(
+                "https://server.duinocoin.com/getPool",
+                timeout=Settings.SOC_TIMEOUT).json()
+            return (response["ip"], int(response["port"]))
+        except KeyboardInterrupt:
+            _exit(0)
+        except Exception as e:
+            pretty_print("Error retrieving mining node: "
+                         + str(e) + ", using the fallback nodes",
+                         "error", "net0")
+            return None
 
-    def send(msg: str):
-        sent = s.sendall(str(msg).encode(Settings.ENCODING))
-        return True
 
-    def recv(limit: int = 128):
-        data = s.recv(limit).decode(Settings.ENCODING).rstrip("\n")
-        return data
+class LineReader:
+    """
+    Newline framed reader of the node protocol - TCP can split or
+    coalesce messages, so bytes are received with recv_into into one
+    reusable buffer and only whole lines are handed out
+    """
+    SIZE = 4096
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.buffer = bytearray(LineReader.SIZE)
+        self.view = memoryview(self.buffer)
+        self.start = 0
+        self.end = 0
+
+    def fill(self):
+        if self.end == LineReader.SIZE:
+            if not self.start:
+                raise ConnectionError("Message longer than "
+                                      + str(LineReader.SIZE) + " bytes")
+            # Moves the partial line to the front, only when full
+            self.buffer[:self.end - self.start] = bytes(
+                self.view[self.start:self.end])
+            self.start, self.end = 0, self.end - self.start
+
+        received = self.connection.recv_into(self.view[self.end:])
+        if not received:
+            raise ConnectionError("Connection closed by the node")
+        self.end += received
+
+    def take(self, end: int, skip: int):
+        message = str(self.view[self.start:end], Settings.ENCODING)
+        self.start = end + skip
+        if self.start == self.end:
+            self.start = self.end = 0
+        return message
+
+    def readline(self):
+        while True:
+            newline = self.buffer.find(b"\n", self.start, self.end)
+            if newline >= 0:
+                return self.take(newline, 1)
+            self.fill()
 
-    def fetch_pool():
+    def read_any(self):
         """
-        Fetches best pool from the /getPool API endpoint
+        Returns everything received so far - for the unframed
+        version banner and the MOTD, which can span several lines
         """
-        while True:
+        if self.start == self.end:
+            self.fill()
+        return self.take(self.end, 0).rstrip("\n")
+
+
+class Transport:
+    """
+    A pool connection - connects and reads time out after soc_timeout,
+    Nagle is disabled as every message is a tiny request waiting for
+    its reply, and TCP keepalive probes notice a half-dead node while
+    the worker is hashing. Replies are framed by a LineReader.
+    Reconnects are delayed by a jittered exponential backoff
+    so workers don't reconnect all at once
+    """
+    KEEPALIVE_IDLE = 30
+    KEEPALIVE_INTERVAL = 10
+    KEEPALIVE_COUNT = 3
+    BACKOFF = 1
+    MAX_BACKOFF = 60
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        self.connection = None
+        self.reader = None
+        self.failures = 0
+
+    def tune(connection):
+        """
+        Disables Nagle and enables keepalive on a connected socket
+        """
+        connection.setsockopt(IPPROTO_TCP, TCP_NODELAY, 1)
+        connection.setsockopt(SOL_SOCKET, SO_KEEPALIVE, 1)
+        for option, value in [("TCP_KEEPIDLE", Transport.KEEPALIVE_IDLE),
+                              ("TCP_KEEPALIVE", Transport.KEEPALIVE_IDLE),
+                              ("TCP_KEEPINTVL",
+                               Transport.KEEPALIVE_INTERVAL),
+                              ("TCP_KEEPCNT", Transport.KEEPALIVE_COUNT)]:
+            if hasattr(sockets, option):
+                try:
+                    connection.setsockopt(IPPROTO_TCP,
+                                          getattr(sockets, option), value)
+                except OSError:
+                    pass
+
+    def delay(failures: int):
+        """
+        Backoff before the next reconnect, between half
+        and all of the exponential delay
+        """
+        delay = min(Transport.BACKOFF * 2 ** failures,
+                    Transport.MAX_BACKOFF)
+        return uniform(delay / 2, delay)
+
+    def connect(self, node: tuple):
+        self.close()
+        self.connection = create_connection(node, self.timeout)
+        Transport.tune(self.connection)
+        self.reader = LineReader(self.connection)
+
+    def send(self, msg: str):
+        self.connection.sendall(str(msg).encode(Settings.ENCODING))
+
+    def recv(self):
+        return self.reader.readline()
+
+    def recv_any(self):
+        return self.reader.read_any()
+
+    def close(self):
+        if self.connection:
             try:
-                pretty_print(get_string("connection_search"),
-                             "warning", "net0")
-                response = requests.get(
-                    "https://server.duinocoin.com/getPool").json()
-                pretty_print(get_string('connecting_node')
-                             + Fore.RESET + Style.NORMAL
-                             + str(response["name"]),
-                             "success", "net0")
-                return (response["ip"], response["port"])
-            except KeyboardInterrupt:
-                _exit(0)
+                self.connection.close()
+            except OSError:
+                pass
+            self.connection = None
+
+    def backoff(self):
+        sleep(Transport.delay(self.failures))
+        self.failures += 1
+
+
+class Pools:
+    """
+    Pool manager - a ranked list of candidate nodes: the ones from the
+    nodes setting, the one /getPool suggests and the public fallbacks,
+    or only the DUCO_NODE ones if it's set (comma separated host:port).
+    All of them are probed at once on startup and every PROBE_TIME,
+    and a node that fails or probes SWITCH_FACTOR slower than the best
+    one is left for it without restarting the workers. Only probe times
+    are compared - a share's ping also includes the node verifying it,
+    so the workers' share pings are kept apart and only reported.
+    A lone node is never backed off, there is nothing to fail over to.
+    Latencies, pings and failure backoffs live in shared memory,
+    like the Stats
+    """
+    FALLBACK = [("server.duinocoin.com", port)
+                for port in [2812, 2813, 2814, 2815, 2816]]
+    PROBE_TIME = 300
+    PROBE_TIMEOUT = 5
+    FAIL_TIME = 15
+    ALPHA = 0.2
+    SWITCH_FACTOR = 2
+    SWITCH_GAP = 0.1
+
+    def __init__(self, nodes: list):
+        self.nodes = nodes
+        self.latency = Array("d", len(nodes), lock=False)
+        self.ping = Array("d", len(nodes), lock=False)
+        self.backoff = Array("d", len(nodes), lock=False)
+
+    def parse(nodes: str):
+        """
+        Returns the (host, port) tuples of a comma separated list
+        """
+        parsed = []
+        for node in nodes.split(","):
+            host, _, port = node.strip().rpartition(":")
+            if host and port.isdigit():
+                parsed.append((host, int(port)))
+        return parsed
+
+    def create(user_settings):
+        """
+        Returns the pool manager with the probed candidates
+        """
+        pretty_print(get_string("connection_search"),
+                     "warning", "net0")
+        if os.environ.get("DUCO_NODE"):
+            candidates = Pools.parse(os.environ["DUCO_NODE"])
+        else:
+            candidates = Pools.parse(user_settings.get("nodes", ""))
+            candidates.append(Client.fetch_pool())
+            candidates += Pools.FALLBACK
+        nodes = []
+        for node in candidates:
+            if node and node not in nodes:
+                nodes.append(node)
+        if not nodes:
+            pretty_print("No valid host:port in DUCO_NODE, "
+                         + "using the fallback nodes",
+                         "error", "net0")
+            nodes = list(Pools.FALLBACK)
+
+        pool = Pools(nodes)
+        pool.refresh()
+        host, port = pool.choose()[0]
+        pretty_print(get_string('connecting_node')
+                     + Fore.RESET + Style.NORMAL
+                     + host + ":" + str(port)
+                     + " (" + str(round(pool.get((host, port)) * 1000))
+                     + "ms, " + str(len(nodes)) + " nodes)",
+                     "success", "net0")
+        return pool
+
+    def probe(nodes: list, timeout: float):
+        """
+        Connects to every node at once, returns {node: seconds until
+        its version banner arrived} of the ones that answered in time
+        """
+        start = time()
+        pending, connecting, results = {}, set(), {}
+        for node in nodes:
+            connection = socket()
+            connection.setblocking(False)
+            try:
+                connection.connect_ex(node)
+            except OSError:
+                connection.close()
+                continue
+            pending[connection] = node
+            connecting.add(connection)
+
+        while pending and time() - start < timeout:
+            readable, writable, _ = select(
+                [c for c in pending if c not in connecting],
+                [c for c in pending if c in connecting], [],
+                timeout - (time() - start))
+            for connection in writable:
+                connecting.discard(connection)
+                if connection.getsockopt(SOL_SOCKET, SO_ERROR):
+                    del pending[connection]
+                    connection.close()
+            for connection in readable:
+                try:
+                    banner = connection.recv(16)
+                except OSError:
+                    banner = b""
+                if banner:
+                    results[pending[connection]] = time() - start
+                del pending[connection]
+                connection.close()
+
+        for connection in pending:
+            connection.close()
+        return results
+
+    def refresh(self):
+        """
+        Probes every candidate, the ones that didn't answer are
+        backed off like failed nodes
+        """
+        results = Pools.probe(self.nodes, Pools.PROBE_TIMEOUT)
+        for node in self.nodes:
+            if node in results:
+                self.observe(node, results[node])
             else:
-                pretty_print("Error retrieving mining node: "
-                             + str(e) + ", retrying in 15s",
-                             "error", "net0")
-                sleep(15)
+                self.failed(node)
+
+    def prober(self):
+        """
+        Main process thread re-ranking the candidates
+        """
+        while True:
+            sleep(Pools.PROBE_TIME)
+            self.refresh()
+
+    def get(self, node: tuple):
+        return self.latency[self.nodes.index(node)]
+
+    def average(values, index: int, value: float):
+        if values[index]:
+            values[index] += Pools.ALPHA * (value - values[index])
+        else:
+            values[index] = value
+
+    def observe(self, node: tuple, latency: float):
+        """
+        Called with the probe times, the only ones the ranking uses
+        """
+        Pools.average(self.latency, self.nodes.index(node), latency)
+
+    def observe_ping(self, node: tuple, ping: float):
+        """
+        Called with the ping of every share
+        """
+        Pools.average(self.ping, self.nodes.index(node), ping)
+
+    def failed(self, node: tuple):
+        if len(self.nodes) > 1:
+            self.backoff[self.nodes.index(node)] = (
+                time() + Pools.FAIL_TIME)
+
+    def choose(self):
+        """
+        Returns (node, seconds to wait before using it) - the fastest
+        node that isn't backed off, or the one whose backoff ends first
+        """
+        now = time()
+        index = min(range(len(self.nodes)),
+                    key=lambda i: (max(self.backoff[i] - now, 0),
+                                   self.latency[i]))
+        return self.nodes[index], max(self.backoff[index] - now, 0)
+
+    def pick(self):
+        node, wait = self.choose()
+        sleep(wait)
+        return node
+
+    def should_leave(self, node: tuple):
+        """
+        True when another usable node probes much faster than this one
+        """
+        best, wait = self.choose()
+        if best == node or wait:
+            return False
+        latency, best_latency = self.get(node), self.get(best)
+        return (latency > Pools.SWITCH_FACTOR * best_latency
+                and latency - best_latency > Pools.SWITCH_GAP)
+
+    def leave(self, node: tuple, id: int):
+        pretty_print("Node " + node[0] + ":" + str(node[1])
+                     + " is slow" + Fore.RESET + Style.NORMAL
+                     + " (probe " + str(round(self.get(node) * 1000))
+                     + "ms, share ping "
+                     + str(round(self.ping[self.nodes.index(node)] * 1000))
+                     + "ms), switching to a faster one",
+                     "warning", "net" + str(id))
 
 
 def get_prefix(symbol: str,
@@ -251,6 +1148,13 @@ def periodic_report(start_time, end_time,
     Displays nicely formated uptime stats
     """
     seconds = round(end_time - start_time)
+    if HEADLESS:
+        Headless.log("report", period=seconds, shares=shares,
+                     shares_per_sec=round(shares/seconds, 1),
+                     hashrate=round(hashrate),
+                     uptime=round(end_time - mining_start_time))
+        return
+
     pretty_print(get_string("periodic_mining_report")
                  + Fore.RESET + Style.NORMAL
                  + get_string("report_period")
@@ -285,62 +1189,162 @@ def calculate_uptime(start_time):
         return str(round(uptime // 3600)) + get_string("uptime_hours")
 
 
-def pretty_print(msg: str = None,
-                 state: str = "success",
-                 sender: str = "sys0"):
+class Console:
     """
-    Produces nicely formatted CLI output for messages:
-    HH:MM:S |sender| msg
+    Single renderer of the console output - once started, workers only
+    put compact events on a queue and one thread of the main process
+    formats and prints them, in order. Share lines of the same worker
+    and type arriving within console_refresh seconds are coalesced
+    into the latest one, which also tells how many there were
     """
-    if sender.startswith("net"):
-        bg_color = Back.BLUE
-    elif sender.startswith("cpu"):
-        bg_color = Back.YELLOW
-    elif sender.startswith("sys"):
-        bg_color = Back.GREEN
-
-    if state == "success":
-        fg_color = Fore.GREEN
-    elif state == "error":
-        fg_color = Fore.RED
-    else:
-        fg_color = Fore.YELLOW
+    REFRESH = 1
+    CLOSE_TIMEOUT = 1
+    queue = None
+    lock = Lock()
+    closed = Event()
 
-    with thread_lock():
-        print(Fore.WHITE + datetime.now().strftime(Style.DIM + "%H:%M:%S ")
-              + Style.BRIGHT + bg_color + " " + sender + " "
-              + Back.RESET + " " + fg_color + msg.strip())
+    def start(refresh: float):
+        Console.queue = Queue()
+        Thread(target=Console.run, args=[refresh], daemon=True).start()
 
+    def emit(*event):
+        """
+        Queues (kind, timestamp, fields...) for the renderer,
+        renders it right away if there is none yet
+        """
+        event = (event[0], time()) + event[1:]
+        if Console.queue:
+            Console.queue.put(event)
+        else:
+            with Console.lock:
+                Console.render(event)
 
-def share_print(id, type,
-                accept, reject,
-                hashrate, total_hashrate,
-                computetime, diff, ping,
-                back_color):
-    """
-    Produces nicely formatted CLI output for shares:
-    HH:MM:S |cpuN| ⛏ Accepted 0/0 (100%) ∙ 0.0s ∙ 0 kH/s ⚙ diff 0 k ∙ ping 0ms
-    """
-    total_hashrate = get_prefix("H/s", total_hashrate, 2)
-    diff = get_prefix("", int(diff), 0)
+    def write(line: str):
+        Console.emit("line", line)
 
-    if type == "accept":
-        share_str = get_string("accepted")
-        fg_color = Fore.GREEN
-    elif type == "block":
-        share_str = get_string("block_found")
-        fg_color = Fore.YELLOW
-    else:
-        share_str = get_string("rejected")
-        fg_color = Fore.RED
+    def close():
+        """
+        Waits (up to CLOSE_TIMEOUT) until everything queued so far
+        is printed, called from the main process before exiting
+        """
+        if Console.queue:
+            Console.queue.put(("close", time()))
+            Console.closed.wait(Console.CLOSE_TIMEOUT)
+        sys.stdout.flush()
+
+    def render(event):
+        """
+        Prints one event - a broken one is reported instead,
+        so it can't take the renderer thread down with it
+        """
+        kind, stamp = event[0], event[1]
+        try:
+            if kind == "message":
+                Console.message(stamp, *event[2:])
+            elif kind == "share":
+                Console.share(stamp, *event[2:])
+            else:
+                print(event[2], flush=True)
+        except Exception as e:
+            print("Can't print a " + str(kind) + " event: " + str(e),
+                  flush=True)
 
-    with thread_lock():
-        print(Fore.WHITE + datetime.now().strftime(Style.DIM + "%H:%M:%S ")
+    def run(refresh: float):
+        pending = {}
+        flush_time = time() + refresh
+        while True:
+            try:
+                event = Console.queue.get(
+                    timeout=max(flush_time - time(), 0.01))
+                if event[0] == "share" and refresh > 0:
+                    key = (event[2], event[3])
+                    count = pending[key][1] + 1 if key in pending else 1
+                    pending[key] = (event, count)
+                elif event[0] == "close":
+                    Console.flush(pending)
+                    Console.closed.set()
+                else:
+                    Console.flush(pending)
+                    Console.render(event)
+            except Empty:
+                pass
+            if time() >= flush_time:
+                Console.flush(pending)
+                flush_time = time() + refresh
+
+    def flush(pending: dict):
+        for event, count in sorted(pending.values(),
+                                   key=lambda shares: shares[0][1]):
+            Console.render(event + (count,))
+        pending.clear()
+
+    def message(stamp: float, msg: str, state: str, sender: str):
+        if HEADLESS:
+            print(Headless.line("message", stamp, level=state,
+                                sender=sender, msg=msg.strip()),
+                  flush=True)
+            return
+
+        if sender.startswith("net"):
+            bg_color = Back.BLUE
+        elif sender.startswith("cpu"):
+            bg_color = Back.YELLOW
+        else:
+            bg_color = Back.GREEN
+
+        if state == "success":
+            fg_color = Fore.GREEN
+        elif state == "error":
+            fg_color = Fore.RED
+        else:
+            fg_color = Fore.YELLOW
+
+        print(Fore.WHITE + datetime.fromtimestamp(stamp).strftime(
+                  Style.DIM + "%H:%M:%S ")
+              + Style.BRIGHT + bg_color + " " + sender + " "
+              + Back.RESET + " " + fg_color + msg.strip())
+
+    def share(stamp: float, id, type,
+              accept, reject,
+              hashrate, total_hashrate,
+              computetime, diff, ping,
+              back_color, count: int = 1):
+        if HEADLESS:
+            print(Headless.line("share", stamp, worker=id, result=type,
+                                accepted=accept, rejected=reject,
+                                hashrate=round(hashrate),
+                                total_hashrate=round(total_hashrate),
+                                computetime=round(computetime, 3),
+                                diff=diff, ping=round(ping),
+                                shares=count),
+                  flush=True)
+            return
+
+        total_hashrate = get_prefix("H/s", total_hashrate, 2)
+        diff = get_prefix("", int(diff), 0)
+
+        if type == "accept":
+            share_str = get_string("accepted")
+            fg_color = Fore.GREEN
+        elif type == "block":
+            share_str = get_string("block_found")
+            fg_color = Fore.YELLOW
+        else:
+            share_str = get_string("rejected")
+            fg_color = Fore.RED
+
+        coalesced = ""
+        if count > 1:
+            coalesced = Style.NORMAL + Fore.RESET + " (x" + str(count) + ")"
+
+        print(Fore.WHITE + datetime.fromtimestamp(stamp).strftime(
+                  Style.DIM + "%H:%M:%S ")
               + Fore.WHITE + Style.BRIGHT + back_color + Fore.RESET
               + " cpu" + str(id) + " " + Back.RESET
               + fg_color + Settings.PICK + share_str + Fore.RESET
               + str(accept) + "/" + str(accept + reject) + Fore.YELLOW
               + " (" + str(round(accept / (accept + reject) * 100)) + "%)"
+              + coalesced
               + Style.NORMAL + Fore.RESET
               + " ∙ " + str("%04.1f" % float(computetime)) + "s"
               + Style.NORMAL + " ∙ " + Fore.BLUE + Style.BRIGHT
@@ -349,6 +1353,32 @@ def share_print(id, type,
               + "ping " + str("%02.0f" % int(ping)) + "ms")
 
 
+def pretty_print(msg: str = None,
+                 state: str = "success",
+                 sender: str = "sys0"):
+    """
+    Produces nicely formatted CLI output for messages:
+    HH:MM:S |sender| msg
+    (formatted by the Console)
+    """
+    Console.emit("message", msg, state, sender)
+
+
+def share_print(id, type,
+                accept, reject,
+                hashrate, total_hashrate,
+                computetime, diff, ping,
+                back_color):
+    """
+    Produces nicely formatted CLI output for shares:
+    HH:MM:S |cpuN| ⛏ Accepted 0/0 (100%) ∙ 0.0s ∙ 0 kH/s ⚙ diff 0 k ∙ ping 0ms
+    (formatted by the Console)
+    """
+    Console.emit("share", id, type, accept, reject,
+                 hashrate, total_hashrate, computetime, diff, ping,
+                 back_color)
+
+
 def get_string(string_name):
     """
     Gets a string from the language file
@@ -361,6 +1391,139 @@ def get_string(string_name):
         return "String not found: " + string_name
 
 
+class Headless:
+    """
+    Non-interactive mode for containers and service managers,
+    settings are layered: defaults < --config file < DUCO_* env < flags
+    """
+    ENV_PREFIX = "DUCO_"
+    DEFAULTS = {
+        "username":    "",
+        "intensity":   95,
+        "threads":     cpu_count(),
+        "start_diff":  "MEDIUM",
+        "donate":      Settings.DONATE_LVL,
+        "identifier":  "None",
+        "algorithm":   "DUCO-S1",
+        "language":    "english",
+        "debug":       "n",
+        "soc_timeout": Settings.SOC_TIMEOUT,
+        "report_sec":  Settings.REPORT_TIME,
+        "discord_rp":  "n",
+        "native_kernel": "y",
+        "affinity":    "auto",
+        "broker":      "n",
+        "broker_connections": cpu_count(),
+        "broker_job_timeout": 600,
+        "pipeline_depth": 1,
+        "metrics_port": 0,
+        "journal":     "",
+        "journal_max_mb": 10,
+        "journal_backups": 5,
+        "journal_compress": "y",
+        "adaptive_diff": "n",
+        "target_share_time": 15,
+        "nodes":       "",
+        "team_size":   1,
+        "stall_time":  120,
+        "console_refresh": 1}
+    FLAGS = ["username", "intensity", "threads", "start_diff",
+             "identifier", "algorithm", "affinity"]
+
+    def parse_args(argv: list):
+        parser = ArgumentParser(description="Duino-Coin PC Miner")
+        parser.add_argument("--headless", action="store_true",
+                            help="no prompts, colors or network "
+                            + "fetches, logfmt output")
+        parser.add_argument("--config",
+                            help="path of a Settings.cfg to start from")
+        parser.add_argument("--node",
+                            help="host:port of the node to mine on "
+                            + "(comma separated for failover), "
+                            + "skips the pool lookup")
+        for key in Headless.FLAGS:
+            parser.add_argument("--" + key.replace("_", "-"), dest=key)
+        parser.add_argument("--profile-startup", action="store_true",
+                            help="report import and init costs")
+        parser.add_argument("--set", action="append", default=[],
+                            metavar="KEY=VALUE",
+                            help="any other Settings.cfg key")
+        return parser.parse_args(argv)
+
+    def load_cfg(args):
+        """
+        Returns the merged settings, exits if there is no username
+        """
+        user_settings = dict(Headless.DEFAULTS)
+
+        if args.config:
+            config = ConfigParser()
+            config.read(args.config)
+            if config.has_section("PC Miner"):
+                user_settings.update(config["PC Miner"])
+
+        for key in Headless.DEFAULTS:
+            env_key = Headless.ENV_PREFIX + key.upper()
+            if os.environ.get(env_key):
+                user_settings[key] = os.environ[env_key]
+
+        for key in Headless.FLAGS:
+            if getattr(args, key) is not None:
+                user_settings[key] = getattr(args, key)
+
+        for item in args.set:
+            key, _, value = item.partition("=")
+            user_settings[key.strip()] = value.strip()
+
+        if args.node:
+            os.environ["DUCO_NODE"] = args.node
+
+        if not user_settings["username"]:
+            Headless.log("fatal", msg="no username, use --username "
+                         + "or " + Headless.ENV_PREFIX + "USERNAME")
+            _exit(1)
+
+        user_settings["algorithm"] = user_settings["algorithm"].upper()
+        if user_settings["algorithm"] == "XXHASH" and not xxhash_en:
+            user_settings["algorithm"] = "DUCO-S1"
+        user_settings["start_diff"] = user_settings["start_diff"].upper()
+        return {key: str(value) for key, value in user_settings.items()}
+
+    def preload():
+        """
+        Loads cached or bundled translations without downloading them
+        """
+        global lang_file
+        global lang
+
+        lang = "english"
+        lang_file = {"english": {}}
+        for path in [Path(Settings.DATA_DIR + Settings.TRANSLATIONS_FILE),
+                     Path(__file__).resolve().parent
+                     / "Resources" / "PC_Miner_langs.json"]:
+            if path.is_file():
+                with open(path, "r", encoding=Settings.ENCODING) as file:
+                    lang_file = json.load(file)
+                break
+
+    def line(event: str, stamp: float, **fields):
+        """
+        Returns a logfmt line: ts=... event=... key=value
+        """
+        line = ("ts=" + datetime.fromtimestamp(stamp).isoformat(
+                    timespec="milliseconds")
+                + " event=" + event)
+        for key, value in fields.items():
+            value = str(value)
+            if not value or " " in value or "=" in value or '"' in value:
+                value = '"' + value.replace('"', '\\"') + '"'
+            line += " " + key + "=" + value
+        return line
+
+    def log(event: str, **fields):
+        Console.write(Headless.line(event, time(), **fields))
+
+
 class Miner:
     def greeting():
         diff_str = get_string("net_diff_short")
@@ -397,7 +1560,22 @@ class Miner:
         print(Style.DIM + Fore.YELLOW + Settings.BLOCK
               + Style.NORMAL + Fore.RESET + "CPU: " + Style.BRIGHT
               + Fore.YELLOW + str(user_settings["threads"])
-              + "x " + str(cpu["brand_raw"]))
+              + "x " + str(Lazy.cpu()))
+
+        cores, logical, nodes = Planner.describe()
+        print(Style.DIM + Fore.YELLOW + Settings.BLOCK
+              + Style.NORMAL + Fore.RESET + "Topology: " + Style.BRIGHT
+              + Fore.YELLOW + str(cores) + " cores, "
+              + str(logical) + " threads, "
+              + str(nodes) + " NUMA node(s)" + Style.NORMAL + Fore.RESET
+              + " ∙ affinity " + str(user_settings.get("affinity", "auto")))
+
+        if (user_settings["algorithm"] == "DUCO-S1"
+                and user_settings.get("native_kernel", "y") == "y"
+                and Kernel.load()):
+            print(Style.DIM + Fore.YELLOW + Settings.BLOCK
+                  + Style.NORMAL + Fore.RESET + "Kernel: " + Style.BRIGHT
+                  + Fore.YELLOW + "native (" + Kernel.lib._name + ")")
 
         if os.name == "nt" or os.name == "posix":
             print(Style.DIM + Fore.YELLOW
@@ -433,7 +1611,8 @@ class Miner:
         if not Path(Settings.DATA_DIR + Settings.TRANSLATIONS_FILE).is_file():
             with open(Settings.DATA_DIR + Settings.TRANSLATIONS_FILE,
                       "wb") as f:
-                f.write(requests.get(Settings.TRANSLATIONS).content)
+                f.write(Lazy.module("requests").get(
+                    Settings.TRANSLATIONS).content)
 
         with open(Settings.DATA_DIR + Settings.TRANSLATIONS_FILE, "r",
                   encoding=Settings.ENCODING) as file:
@@ -524,11 +1703,6 @@ class Miner:
                                 + str(cpu_count()) + "): " + Style.BRIGHT))
             if not threads:
                 threads = cpu_count()
-            elif int(threads) > 8:
-                threads = 8
-                pretty_print(
-                    Style.BRIGHT
-                    + get_string("max_threads_notice"))
             elif int(threads) < 1:
                 threads = 1
 
@@ -568,7 +1742,24 @@ class Miner:
                 "debug":       "n",
                 "soc_timeout": Settings.SOC_TIMEOUT,
                 "report_sec":  Settings.REPORT_TIME,
-                "discord_rp":  "y"}
+                "discord_rp":  "y",
+                "native_kernel": "y",
+                "affinity":    "auto",
+                "broker":      "n",
+                "broker_connections": threads,
+                "broker_job_timeout": 600,
+                "pipeline_depth": 1,
+                "metrics_port": 0,
+                "journal":     "",
+                "journal_max_mb": 10,
+                "journal_backups": 5,
+                "journal_compress": "y",
+                "adaptive_diff": "n",
+                "target_share_time": 15,
+                "nodes":       "",
+                "team_size":   1,
+                "stall_time":  120,
+                "console_refresh": 1}
 
             with open(Settings.DATA_DIR + Settings.SETTINGS_FILE,
                       "w") as configfile:
@@ -579,13 +1770,13 @@ class Miner:
                           + Settings.SETTINGS_FILE)
         return configparser["PC Miner"]
 
-    def m_connect(id, pool):
-        socket_connection = Client.connect(pool)
-        POOL_VER = Client.recv(5)
+    def m_connect(id, pool, transport):
+        transport.connect(pool)
+        POOL_VER = transport.recv_any()
 
         if id == 0:
-            Client.send("MOTD")
-            motd = Client.recv().replace("\n", "\n\t\t")
+            transport.send("MOTD")
+            motd = transport.recv_any().replace("\n", "\n\t\t")
 
             pretty_print("MOTD: " + Fore.RESET + Style.NORMAL + str(motd),
                          "success", "net" + str(id))
@@ -604,13 +1795,41 @@ class Miner:
                              "warning", "net" + str(id))
                 sleep(5)
 
-    def mine(id: int, user_settings: list,
-             pool: tuple,
-             accept: int, reject: int,
-             hashrate: list):
+    def select_algorithm(user_settings):
         """
-        Main section that executes the functionalities from the sections above.
+        Returns the function solving jobs for the configured algorithm
+        and the background color of its share lines
         """
+        if user_settings["algorithm"] == "XXHASH":
+            return Algorithms.XXHASH, Back.CYAN
+        if (user_settings.get("native_kernel", "y") == "y"
+                and Kernel.load()):
+            return Kernel.DUCOS1, Back.YELLOW
+        return Algorithms.DUCOS1, Back.YELLOW
+
+    def job_request(user_settings, diff_tier: str = None):
+        job_req = "JOB"
+        if user_settings["algorithm"] == "XXHASH":
+            job_req = "JOBXX"
+
+        return (job_req
+                + Settings.SEPARATOR
+                + str(user_settings["username"])
+                + Settings.SEPARATOR
+                + str(diff_tier or user_settings["start_diff"]))
+
+    def result_message(result: list, user_settings):
+        return (str(result[0])
+                + Settings.SEPARATOR
+                + str(result[1])
+                + Settings.SEPARATOR
+                + "Official PC Miner ("
+                + user_settings["algorithm"]
+                + ") v" + str(Settings.VER)
+                + Settings.SEPARATOR
+                + str(user_settings["identifier"]))
+
+    def announce(id: int, user_settings):
         using_algo = get_string("using_algo")
         if user_settings["algorithm"] == "XXHASH":
             using_algo = get_string("using_algo_xxh")
@@ -622,102 +1841,984 @@ class Miner:
                      + "% " + get_string("efficiency"),
                      "success", "sys"+str(id))
 
-        last_report = time()
-        report_shares, last_report_shares = 0, 0
+    def handle_feedback(id: int, feedback: list,
+                        result: list, computetime: float,
+                        diff: str, ping: float,
+                        back_color, stats, journal=None):
+        """
+        Counts, prints and journals the share the node has just replied to
+        """
+        if feedback[0] == "GOOD":
+            share_type = "accept"
+            Stats.add(stats, id, Stats.ACCEPT)
+        elif feedback[0] == "BLOCK":
+            share_type = "block"
+            Stats.add(stats, id, Stats.REJECT)
+        elif feedback[0] == "BAD":
+            share_type = "reject"
+            Stats.add(stats, id, Stats.REJECT)
+        else:
+            pretty_print("Node message: " + str(feedback[0]))
+            return
+
+        Stats.set(stats, id, Stats.LAST_SHARE, time())
+        Stats.set(stats, id, Stats.DIFF, float(diff))
+        Stats.observe(stats, id, Stats.PING_HIST,
+                      Stats.PING_BUCKETS, ping / 1000)
+        Stats.observe(stats, id, Stats.COMPUTE_HIST,
+                      Stats.COMPUTE_BUCKETS, computetime)
+        Journal.record(journal, worker=id, diff=int(diff),
+                       nonce=result[0], hashrate=round(result[1]),
+                       compute=round(computetime, 4),
+                       ping=round(ping, 1), result=feedback[0])
+        share_print(id, share_type,
+                    int(Stats.total(stats, Stats.ACCEPT)),
+                    int(Stats.total(stats, Stats.REJECT)),
+                    result[1], Stats.total(stats, Stats.HASHRATE),
+                    computetime, diff, ping,
+                    back_color)
+
+    def report(stats, last_report: dict):
+        """
+        Prints the periodic report once REPORT_TIME has passed,
+        last_report keeps the time and share count of the previous one
+        """
+        end_time = time()
+        if end_time - last_report["time"] < Settings.REPORT_TIME:
+            return
+
+        accepted = int(Stats.total(stats, Stats.ACCEPT))
+        uptime = calculate_uptime(mining_start_time)
+        periodic_report(last_report["time"], end_time,
+                        accepted - last_report["shares"],
+                        Stats.total(stats, Stats.HASHRATE),
+                        uptime)
+        last_report["time"] = time()
+        last_report["shares"] = accepted
+
+    def mine(id: int, user_settings: list,
+             pool, stats, duty, cpus=None, journal=None, team=None):
+        """
+        Main section that executes the functionalities from the sections above.
+        """
+        Planner.pin(cpus)
+        Miner.announce(id, user_settings)
+        governor = Governor(duty, stats, id)
+        solve, back_color = Miner.select_algorithm(user_settings)
+        if team:
+            solve = team.lead(solve)
+        Startup.worker_ready(id)
+
+        difficulty = Difficulty(user_settings, id)
+        transport = Transport(float(user_settings.get(
+            "soc_timeout", Settings.SOC_TIMEOUT)))
+
+        last_report = {"time": time(), "shares": 0}
         while True:
+            node = pool.pick()
             try:
-                Miner.m_connect(id, pool)
+                Stats.add(stats, id, Stats.CONNECTS)
+                Miner.m_connect(id, node, transport)
                 while True:
-                    job_req = "JOB"
-                    if user_settings["algorithm"] == "XXHASH":
-                        job_req = "JOBXX"
-
-                    Client.send(job_req
-                                + Settings.SEPARATOR
-                                + str(user_settings["username"])
-                                + Settings.SEPARATOR
-                                + str(user_settings["start_diff"]))
+                    transport.send(Miner.job_request(user_settings,
+                                                     difficulty.tier))
 
-                    job = Client.recv().split(Settings.SEPARATOR)
+                    job = transport.recv().split(Settings.SEPARATOR)
+                    governor.reset()
 
                     time_start = time()
-                    if user_settings["algorithm"] == "XXHASH":
-                        back_color = Back.CYAN
-                        result = Algorithms.XXHASH(job[0], job[1], int(job[2]),
-                                                   user_settings["intensity"])
-                    else:
-                        back_color = Back.YELLOW
-                        result = Algorithms.DUCOS1(job[0], job[1], int(job[2]),
-                                                   user_settings["intensity"])
+                    result = solve(job[0], job[1], int(job[2]), governor)
                     computetime = time() - time_start
 
-                    hashrate[id] = result[1]
-                    total_hashrate = sum(hashrate.values())
+                    Stats.set(stats, id, Stats.HASHRATE, result[1])
 
-                    Client.send(str(result[0])
-                                + Settings.SEPARATOR
-                                + str(result[1])
-                                + Settings.SEPARATOR
-                                + "Official PC Miner ("
-                                + user_settings["algorithm"]
-                                + ") v" + str(Settings.VER)
-                                + Settings.SEPARATOR
-                                + str(user_settings["identifier"]))
+                    transport.send(Miner.result_message(result,
+                                                        user_settings))
 
                     time_start = time()
-                    feedback = Client.recv().split(Settings.SEPARATOR)
+                    feedback = transport.recv().split(Settings.SEPARATOR)
                     ping = (time() - time_start) * 1000
+                    transport.failures = 0
 
-                    if feedback[0] == "GOOD":
-                        accept.value += 1
-                        share_print(id, "accept",
-                                    accept.value, reject.value,
-                                    result[1], total_hashrate,
-                                    computetime, job[2], ping,
-                                    back_color)
-
-                    elif feedback[0] == "BLOCK":
-                        reject.value += 1
-                        share_print(id, "block",
-                                    accept.value, reject.value,
-                                    result[1], total_hashrate,
-                                    computetime, job[2], ping,
-                                    back_color)
-
-                    elif feedback[0] == "BAD":
-                        reject.value += 1
-                        share_print(id, "reject",
-                                    accept.value, reject.value,
-                                    result[1], total_hashrate,
-                                    computetime, job[2], ping,
-                                    back_color)
-
-                    else:
-                        pretty_print("Node message: " + str(feedback[0]))
+                    Miner.handle_feedback(id, feedback, result,
+                                          computetime, job[2], ping,
+                                          back_color, stats, journal)
+                    difficulty.update(int(job[2]), result[1], ping / 1000)
+                    pool.observe_ping(node, ping / 1000)
 
                     if id == 0:
-                        end_time = time()
-                        elapsed_time = end_time - last_report
-                        if elapsed_time >= Settings.REPORT_TIME:
-                            report_shares = accept.value - last_report_shares
-                            uptime = calculate_uptime(mining_start_time)
-                            periodic_report(last_report, end_time,
-                                            report_shares,
-                                            sum(hashrate.values()), uptime)
-                            last_report = time()
-                            last_report_shares = accept.value 
+                        Miner.report(stats, last_report)
+
+                    if pool.should_leave(node):
+                        pool.leave(node, id)
+                        break
+
+            except KeyboardInterrupt:
+                _exit(0)
+            except Exception as e:
+                pool.failed(node)
+                pretty_print("Connection error: " + str(e)
+                             + ", failing over",
+                             "error", "net" + str(id))
+                transport.close()
+                transport.backoff()
+            transport.close()
+
+    def mine_pipelined(id: int, user_settings: list,
+                       pool, stats, duty, cpus=None, journal=None,
+                       team=None):
+        """
+        Worker used when pipeline_depth > 1 - jobs are prefetched
+        over several connections while the current one is hashed
+        """
+        Planner.pin(cpus)
+        Miner.announce(id, user_settings)
+        governor = Governor(duty, stats, id)
+        solve, back_color = Miner.select_algorithm(user_settings)
+        if team:
+            solve = team.lead(solve)
+        Startup.worker_ready(id)
+        prefetcher = Prefetcher(id, user_settings, pool, stats, back_color,
+                                int(user_settings["pipeline_depth"]),
+                                journal)
+
+        last_report = {"time": time(), "shares": 0}
+        while True:
+            try:
+                slot, generation, job = prefetcher.next_job()
+                governor.reset()
 
+                time_start = time()
+                result = solve(job[0], job[1], int(job[2]), governor)
+                computetime = time() - time_start
+
+                Stats.set(stats, id, Stats.HASHRATE, result[1])
+                prefetcher.submit(slot, generation, result, computetime)
+
+                if id == 0:
+                    Miner.report(stats, last_report)
             except KeyboardInterrupt:
                 _exit(0)
+
+    def mine_teamed(id: int, user_settings: list,
+                    team, member: int, stats, duty, cpus=None):
+        """
+        Worker of a team other than its leader - searches its
+        share of the blocks of every job the leader hands out.
+        Every new process of the member bumps its generation, so the
+        leader can tell when the one holding a job was replaced
+        """
+        Planner.pin(cpus)
+        Miner.announce(id, user_settings)
+        governor = Governor(duty, stats, id)
+        solve, _ = Miner.select_algorithm(user_settings)
+        Startup.worker_ready(id)
+        team.generation[member] += 1
+        jobs, done = team.jobs[member][0], team.done[member][1]
+
+        while True:
+            try:
+                job_id, last_h, exp_h, diff = governor.wait(jobs)
+                if job_id != team.job.value:
+                    # Sent before the leader gave up on it
+                    continue
+                team.taken[member] = team.generation[member]
+                governor.reset()
+                result = solve(last_h, exp_h, diff, governor,
+                               member, team.size, team.claim(job_id))
+                done.send((job_id, result[1]))
+            except KeyboardInterrupt:
+                _exit(0)
+
+    def mine_brokered(id: int, user_settings: list,
+                      link, stats, duty, cpus=None):
+        """
+        Worker used in broker mode - takes jobs from its broker pipe
+        and hands the results back instead of talking to the node.
+        Every message sent back also means the worker is ready
+        """
+        Planner.pin(cpus)
+        Miner.announce(id, user_settings)
+        governor = Governor(duty, stats, id)
+        solve, _ = Miner.select_algorithm(user_settings)
+        Startup.worker_ready(id)
+        link.send(None)
+
+        while True:
+            try:
+                key, job = governor.wait(link)
+                governor.reset()
+
+                time_start = time()
+                result = solve(job[0], job[1], int(job[2]), governor)
+                computetime = time() - time_start
+
+                Stats.set(stats, id, Stats.HASHRATE, result[1])
+                link.send((key, id, result, computetime))
+            except KeyboardInterrupt:
+                _exit(0)
+
+
+class Found:
+    """
+    A member's view of its team's shared nonce for one job - the
+    slot holds the id of the job it belongs to next to the nonce.
+    A view of an older job reads as found, so a stale member stops at
+    its next block, and can't publish into a newer job's slot
+    """
+    def __init__(self, slot, job_id: int):
+        self.slot = slot
+        self.job_id = job_id
+
+    @property
+    def value(self):
+        with self.slot.get_lock():
+            if self.slot[0] != self.job_id:
+                return 0
+            return self.slot[1]
+
+    @value.setter
+    def value(self, nonce: int):
+        with self.slot.get_lock():
+            if self.slot[0] == self.job_id and self.slot[1] < 0:
+                self.slot[1] = nonce
+
+
+class Team:
+    """
+    Cooperative mode, enabled with team_size > 1 - every team_size
+    workers share one pool connection and split each job's nonce space
+    into interleaved blocks. The leader fetches the job and hands it
+    to the other members through their queues, whoever finds the
+    nonce publishes it in shared memory and the rest stop at their
+    next block. Fewer, faster shares over fewer sockets - the leader's
+    stats row carries the hashrate of the whole team.
+    Every member has its own pair of pipes rather than a shared queue,
+    a member killed while waiting can't take a queue lock with it
+    """
+    GRACE = 10
+    POLL = 1
+
+    def __init__(self, size: int, leader: int = 0):
+        self.size = size
+        self.leader = leader
+        self.found = Array("q", [0, -1])
+        self.job = Value("q", 0, lock=False)
+        self.generation = Array("q", size, lock=False)
+        self.taken = Array("q", size, lock=False)
+        self.jobs = [None] + [Pipe(duplex=False) for _ in range(1, size)]
+        self.done = [None] + [Pipe(duplex=False) for _ in range(1, size)]
+
+    def claim(self, job_id: int):
+        """
+        Returns the found view of a job
+        """
+        return Found(self.found, job_id)
+
+    def tag(self, job_id: int):
+        """
+        Hands the shared nonce slot to a job, views of older jobs
+        read as found from now on
+        """
+        with self.found.get_lock():
+            self.found[0] = job_id
+            self.found[1] = -1
+
+    def create(workers: int, size: int):
+        """
+        Returns the team of every worker, the last one may be smaller
+        """
+        teams = []
+        for first in range(0, workers, size):
+            team = Team(min(size, workers - first), first)
+            teams += [team] * team.size
+        return teams
+
+    def lead(self, solve):
+        """
+        Wraps the leader's solve function - the job goes to the other
+        members, the leader searches its own blocks and then waits for
+        theirs, so no member is still busy when the next job comes.
+        The leader gives up on the job and submits what it has when
+        a member doesn't report back within the time the leader's own
+        search took (at least GRACE seconds), or when the process that
+        took the job was restarted and the team re-formed
+        """
+        def solve_team(last_h: str, exp_h: str, diff: int,
+                       governor=None):
+            self.job.value += 1
+            job_id = self.job.value
+            self.tag(job_id)
+            found = self.claim(job_id)
+            for member in range(1, self.size):
+                self.taken[member] = 0
+                self.jobs[member][1].send((job_id, last_h, exp_h, diff))
+
+            time_start = time()
+            result = solve(last_h, exp_h, diff, governor,
+                           0, self.size, found)
+            deadline = time() + max(time() - time_start, Team.GRACE)
+
+            waiting = set(range(1, self.size))
+            while waiting and time() < deadline:
+                ready = wait_ready([self.done[member][0]
+                                    for member in waiting],
+                                   min(Team.POLL, deadline - time()))
+                for member in list(waiting):
+                    if self.done[member][0] in ready:
+                        done_id, hashrate = self.done[member][0].recv()
+                        if done_id == job_id:
+                            waiting.discard(member)
+                            result[1] += hashrate
+                if not ready and self.restarted(waiting):
+                    break
+
+            result[0] = max(found.value, 0)
+            if waiting:
+                self.give_up(waiting)
+            return result
+        return solve_team
+
+    def restarted(self, members: set):
+        """
+        Whether a process that took the current job was replaced
+        """
+        return any(self.taken[member]
+                   and self.taken[member] != self.generation[member]
+                   for member in members)
+
+    def give_up(self, members: set):
+        """
+        Abandons the current job - the members still searching stop at
+        their next block and the copies already sent are skipped
+        """
+        self.job.value += 1
+        self.tag(self.job.value)
+        pretty_print("Team gave up on the job, member(s) "
+                     + ", ".join(str(self.leader + member)
+                                 for member in sorted(members))
+                     + " didn't report back",
+                     "warning", "sys" + str(self.leader))
+
+
+class Supervisor:
+    """
+    Keeps the workers running from the main process - a worker that
+    died, or whose heartbeat (see Governor.beat) is older than
+    stall_time, is restarted after an exponential backoff that resets
+    once it has been up for STABLE_TIME. Restarts are counted in the
+    worker's stats row
+    """
+    CHECK_TIME = 5
+    STALL_TIME = 120
+    BACKOFF = 2
+    MAX_BACKOFF = 300
+    STABLE_TIME = 600
+
+    def __init__(self, stats, stall_time: float):
+        self.stats = stats
+        self.stall_time = stall_time
+        self.workers = []
+
+    def start(self, target, args: list):
+        self.workers.append({"target": target, "args": args,
+                             "failures": 0, "restart_at": 0})
+        p_list.append(None)
+        self.spawn(len(self.workers) - 1)
+
+    def run(console, target, args: list):
+        """
+        Entry point of the workers
+        """
+        Console.queue = console
+        target(*args)
+
+    def spawn(self, id: int):
+        worker = self.workers[id]
+        Stats.set(self.stats, id, Stats.HEARTBEAT, time())
+        p_list[id] = Process(target=Supervisor.run,
+                             args=[Console.queue,
+                                   worker["target"], worker["args"]])
+        p_list[id].start()
+        worker["started"] = time()
+        worker["restart_at"] = 0
+
+    def check(self, id: int):
+        worker, p = self.workers[id], p_list[id]
+        now = time()
+        if worker["restart_at"]:
+            if now >= worker["restart_at"]:
+                self.spawn(id)
+            return
+
+        silence = now - Stats.get(self.stats, id, Stats.HEARTBEAT)
+        if not p.is_alive():
+            reason = "exited with code " + str(p.exitcode)
+        elif silence > self.stall_time:
+            reason = "stalled for " + str(round(silence)) + "s"
+            p.terminate()
+            p.join(Supervisor.CHECK_TIME)
+            if p.is_alive():
+                p.kill()
+        else:
+            if now - worker["started"] > Supervisor.STABLE_TIME:
+                worker["failures"] = 0
+            return
+
+        delay = min(Supervisor.BACKOFF * 2 ** worker["failures"],
+                    Supervisor.MAX_BACKOFF)
+        worker["failures"] += 1
+        worker["restart_at"] = now + delay
+        Stats.add(self.stats, id, Stats.RESTARTS)
+        pretty_print("Mining thread #" + str(id) + " " + reason
+                     + Fore.RESET + Style.NORMAL + ", restarting in "
+                     + str(delay) + "s (restarts: "
+                     + str(int(Stats.get(self.stats, id, Stats.RESTARTS)))
+                     + ")", "error", "sys" + str(id))
+
+    def watch(self):
+        while True:
+            sleep(Supervisor.CHECK_TIME)
+            for id in range(len(self.workers)):
+                self.check(id)
+
+
+class Prefetcher:
+    """
+    Pipelined mode for a single worker - `depth` pool connections are
+    driven by helper threads that always keep a job ready, so while the
+    worker hashes one job the others submit results, wait for feedback
+    and fetch the next jobs. Each connection still follows the plain
+    JOB -> result -> feedback order the node expects
+    """
+
+    def __init__(self, id: int, user_settings, pool,
+                 stats, back_color, depth: int, journal=None):
+        self.id = id
+        self.user_settings = user_settings
+        self.pool = pool
+        self.stats = stats
+        self.journal = journal
+        self.difficulty = Difficulty(user_settings, id)
+        self.back_color = back_color
+        self.ready = LocalQueue()
+        self.outboxes = [LocalQueue() for _ in range(depth)]
+        self.generations = [0] * depth
+
+        for slot in range(depth):
+            Thread(target=self.run, args=[slot], daemon=True).start()
+
+    def next_job(self):
+        """
+        Returns (slot, generation, job) of the next prefetched job
+        """
+        return self.ready.get()
+
+    def submit(self, slot: int, generation: int,
+               result: list, computetime: float):
+        self.outboxes[slot].put((generation, result, computetime))
+
+    def run(self, slot: int):
+        transport = Transport(float(self.user_settings.get(
+            "soc_timeout", Settings.SOC_TIMEOUT)))
+        while True:
+            node = self.pool.pick()
+            try:
+                transport.connect(node)
+                Stats.add(self.stats, self.id, Stats.CONNECTS)
+                transport.recv_any()
+
+                while True:
+                    transport.send(Miner.job_request(self.user_settings,
+                                                     self.difficulty.tier))
+                    job = transport.recv().split(Settings.SEPARATOR)
+                    if len(job) < 3:
+                        pretty_print("Node message: " + str(job[0]),
+                                     "warning", "net" + str(self.id))
+                        sleep(10)
+                        continue
+
+                    generation = self.generations[slot]
+                    self.ready.put((slot, generation, job))
+                    while True:
+                        done, result, computetime = self.outboxes[slot].get()
+                        if done == generation:
+                            break
+
+                    transport.send(Miner.result_message(
+                        result, self.user_settings))
+
+                    time_start = time()
+                    feedback = transport.recv().split(Settings.SEPARATOR)
+                    ping = (time() - time_start) * 1000
+                    transport.failures = 0
+
+                    Miner.handle_feedback(self.id, feedback, result,
+                                          computetime, job[2], ping,
+                                          self.back_color, self.stats,
+                                          self.journal)
+                    self.difficulty.update(int(job[2]), result[1],
+                                           ping / 1000)
+                    self.pool.observe_ping(node, ping / 1000)
+
+                    if self.pool.should_leave(node):
+                        self.pool.leave(node, self.id)
+                        break
+            except Exception as e:
+                # Results of jobs from the dead connection are dropped
+                self.generations[slot] += 1
+                self.pool.failed(node)
+                pretty_print("Connection error: " + str(e)
+                             + ", failing over",
+                             "error", "net" + str(self.id))
+                transport.close()
+                transport.backoff()
+            transport.close()
+
+
+class Broker:
+    """
+    Optional connection broker - the main process keeps a few persistent
+    pool connections on one asyncio loop, hands their jobs to idle workers
+    through a pipe per worker and submits the results, so workers never
+    block on network I/O and the node sees fewer sockets per host.
+    Pipes rather than a shared queue, so that a worker killed while
+    waiting can't leave a queue lock held for everyone else.
+    The protocol allows one job in flight per connection, so
+    broker_connections bounds how many workers can be busy at once.
+    A job whose worker doesn't answer within broker_job_timeout of
+    taking it is dropped - time spent in the backlog waiting for a
+    free worker doesn't count
+    """
+    RETRY_TIME = 10
+    JOB_TIMEOUT = 600
+    connects = {}
+
+    def start(user_settings, pool, stats, connections: int,
+              workers: int, journal=None):
+        """
+        Starts the broker thread, returns the worker end
+        of every worker's pipe
+        """
+        links = [Pipe() for _ in range(workers)]
+        Thread(target=Broker.run,
+               args=[user_settings, pool, stats, connections,
+                     [link[0] for link in links], journal],
+               daemon=True).start()
+        return [link[1] for link in links]
+
+    def run(user_settings, pool, stats,
+            connections: int, links: list, journal):
+        asyncio = Lazy.module("asyncio")
+        asyncio.run(Broker.serve(user_settings, pool, stats,
+                                 connections, links, journal))
+
+    async def serve(user_settings, pool, stats,
+                    connections: int, links: list, journal):
+        asyncio = Lazy.module("asyncio")
+        loop = asyncio.get_running_loop()
+        pending, taken = {}, {}
+        idle, backlog = set(), deque()
+
+        def hand_out(worker: int, key, job):
+            links[worker].send((key, job))
+            started = taken.pop(key, None)
+            if started and not started.done():
+                started.set_result(worker)
+
+        def dispatch(key, job):
+            """
+            Returns a future resolved once a worker took the job
+            """
+            taken[key] = loop.create_future()
+            started = taken[key]
+            if idle:
+                hand_out(idle.pop(), key, job)
             else:
-                pretty_print("Error, restarting")
+                backlog.append((key, job))
+            return started
+
+        def deliver(worker: int, message):
+            if message:
+                future = pending.pop(message[0], None)
+                if future and not future.done():
+                    future.set_result(message)
+            while backlog:
+                key, job = backlog.popleft()
+                if key in pending:
+                    hand_out(worker, key, job)
+                    return
+            idle.add(worker)
+
+        def pump():
+            # Pipes can't be awaited, so a helper thread
+            # forwards what the workers send into the event loop
+            while True:
+                for link in wait_ready(links):
+                    try:
+                        message = link.recv()
+                    except (EOFError, OSError):
+                        continue
+                    loop.call_soon_threadsafe(deliver,
+                                              links.index(link), message)
+
+        Thread(target=pump, daemon=True).start()
+        await asyncio.gather(*[
+            Broker.session(i, user_settings, pool, stats,
+                           dispatch, pending, journal)
+            for i in range(connections)])
+
+    async def readline(reader, timeout: float):
+        asyncio = Lazy.module("asyncio")
+        line = await asyncio.wait_for(reader.readline(), timeout)
+        if not line:
+            raise ConnectionError("Connection closed by the node")
+        return line.decode(Settings.ENCODING).rstrip("\n")
+
+    async def session(conn_id: int, user_settings, pool,
+                      stats, dispatch, pending: dict, journal):
+        """
+        Runs one persistent pool connection
+        """
+        asyncio = Lazy.module("asyncio")
+        loop = asyncio.get_running_loop()
+        _, back_color = Miner.select_algorithm(user_settings)
+        difficulty = Difficulty(user_settings, conn_id)
+        last_report = {"time": time(), "shares": 0}
+        timeout = float(user_settings.get("soc_timeout",
+                                          Settings.SOC_TIMEOUT))
+        job_timeout = float(user_settings.get("broker_job_timeout",
+                                              Broker.JOB_TIMEOUT))
+        failures = 0
+        seq = 0
+
+        while True:
+            node, wait = pool.choose()
+            await asyncio.sleep(wait)
+            writer = None
+            try:
+                reader, writer = await asyncio.wait_for(
+                    asyncio.open_connection(*node), timeout)
+                Transport.tune(writer.get_extra_info("socket"))
+                Broker.connects[conn_id] = (
+                    Broker.connects.get(conn_id, 0) + 1)
+                pool_ver = (await asyncio.wait_for(
+                    reader.read(16), timeout)).decode(Settings.ENCODING)
+                if conn_id == 0:
+                    pretty_print(get_string("connected") + Fore.RESET
+                                 + Style.NORMAL
+                                 + get_string("connected_server")
+                                 + str(pool_ver).strip() + ", " + node[0]
+                                 + ":" + str(node[1]) + ")",
+                                 "success", "net0")
+
+                while True:
+                    writer.write(Miner.job_request(user_settings,
+                                                   difficulty.tier)
+                                 .encode(Settings.ENCODING))
+                    await writer.drain()
+                    job = (await Broker.readline(reader, timeout)).split(
+                        Settings.SEPARATOR)
+                    if len(job) < 3:
+                        pretty_print("Node message: " + str(job[0]),
+                                     "warning", "net" + str(conn_id))
+                        await asyncio.sleep(Broker.RETRY_TIME)
+                        continue
+
+                    seq += 1
+                    future = loop.create_future()
+                    pending[(conn_id, seq)] = future
+                    # Waiting for a free worker is expected when there
+                    # are more connections than workers, only the
+                    # solving itself is timed
+                    await dispatch((conn_id, seq), job)
+                    try:
+                        _, id, result, computetime = await asyncio.wait_for(
+                            future, job_timeout)
+                    except asyncio.TimeoutError:
+                        # The worker holding it died or was restarted -
+                        # drop the job and ask
+                        # for a new one on a fresh connection, since the
+                        # node still waits for a result on this one
+                        pending.pop((conn_id, seq), None)
+                        pretty_print("No result after "
+                                     + str(round(job_timeout))
+                                     + "s, dropping the job",
+                                     "warning", "net" + str(conn_id))
+                        break
+
+                    writer.write(Miner.result_message(result, user_settings)
+                                 .encode(Settings.ENCODING))
+                    await writer.drain()
+
+                    time_start = time()
+                    feedback = (await Broker.readline(
+                        reader, timeout)).split(Settings.SEPARATOR)
+                    ping = (time() - time_start) * 1000
+                    failures = 0
+
+                    Miner.handle_feedback(id, feedback, result,
+                                          computetime, job[2], ping,
+                                          back_color, stats, journal)
+                    difficulty.update(int(job[2]), result[1], ping / 1000)
+                    pool.observe_ping(node, ping / 1000)
+                    if conn_id == 0:
+                        Miner.report(stats, last_report)
+
+                    if pool.should_leave(node):
+                        pool.leave(node, conn_id)
+                        break
+
+            except Exception as e:
+                pool.failed(node)
+                pretty_print("Broker connection error: " + str(e)
+                             + ", failing over",
+                             "error", "net" + str(conn_id))
+                await asyncio.sleep(Transport.delay(failures))
+                failures += 1
+            if writer:
+                writer.close()
+
+
+class Journal:
+    """
+    JSON-lines share log for offline analysis, enabled by setting the
+    journal path. Workers only put records on a queue - a thread of the
+    main process does the buffered writes, flushes them every FLUSH_TIME
+    and rotates the file once it's journal_max_mb big, keeping
+    journal_backups old files (gzipped if journal_compress is y).
+    Records are dropped while QUEUE_SIZE of them wait for the writer,
+    and journaling is turned off if the file can't be opened at all
+    """
+    FLUSH_TIME = 5
+    BUFFER = 64 * 1024
+    QUEUE_SIZE = 10_000
+    file = None
+
+    def start(user_settings):
+        """
+        Starts the writer thread, returns the queue and enabled flag
+        to pass to the workers or None if the journal is disabled
+        """
+        path = user_settings.get("journal", "")
+        if not path:
+            return None
+
+        journal = (Queue(Journal.QUEUE_SIZE), Value("b", 1, lock=False))
+        Thread(target=Journal.writer,
+               args=[journal, path,
+                     float(user_settings.get("journal_max_mb", 10))
+                     * 1024 * 1024,
+                     int(user_settings.get("journal_backups", 5)),
+                     user_settings.get("journal_compress", "y") == "y"],
+               daemon=True).start()
+        return journal
+
+    def record(journal, **fields):
+        if journal is not None and journal[1].value:
+            try:
+                journal[0].put_nowait(dict(ts=round(time(), 3), **fields))
+            except Full:
+                pass
+
+    def open_file(path: str):
+        """
+        Opens the journal for appending, returns its current size
+        """
+        Journal.file = open(path, "a", encoding=Settings.ENCODING,
+                            buffering=Journal.BUFFER)
+        return Path(path).stat().st_size
+
+    def close():
+        if Journal.file:
+            try:
+                Journal.file.close()
+            except Exception:
+                pass
+
+    def rotate(path: str, backups: int, compress: bool):
+        """
+        journal.jsonl -> journal.jsonl.1[.gz] -> ... -> .backups[.gz]
+        """
+        Journal.close()
+        suffix = ".gz" if compress else ""
+        for i in range(backups - 1, 0, -1):
+            if Path(path + "." + str(i) + suffix).is_file():
+                os.replace(path + "." + str(i) + suffix,
+                           path + "." + str(i + 1) + suffix)
+        if backups < 1:
+            os.remove(path)
+        elif compress:
+            with open(path, "rb") as src, \
+                    gzip.open(path + ".1.gz", "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(path)
+        else:
+            os.replace(path, path + ".1")
+
+    def writer(journal, path: str, max_bytes: float,
+               backups: int, compress: bool):
+        records, enabled = journal
+        size = None
+        last_flush = time()
+        while True:
+            try:
+                if size is None or Journal.file.closed:
+                    # First open, or a failed rotation left it closed
+                    size = Journal.open_file(path)
+                try:
+                    line = json.dumps(
+                        records.get(timeout=Journal.FLUSH_TIME),
+                        separators=(",", ":")) + "\n"
+                    Journal.file.write(line)
+                    size += len(line)
+                except Empty:
+                    pass
+
+                if time() - last_flush >= Journal.FLUSH_TIME:
+                    Journal.file.flush()
+                    last_flush = time()
+                if size >= max_bytes:
+                    Journal.rotate(path, backups, compress)
+                    size = Journal.open_file(path)
+            except Exception as e:
+                if size is None:
+                    enabled.value = 0
+                    pretty_print("Can't open the share journal, "
+                                 + "journaling disabled: " + str(e),
+                                 "error")
+                    return
+                pretty_print("Share journal error: " + str(e), "error")
+                sleep(Journal.FLUSH_TIME)
+
+
+class Metrics:
+    """
+    Prometheus/OpenMetrics endpoint, served from a thread of the main
+    process when metrics_port is set. Everything is read straight from
+    the shared stats block, so scraping never touches the workers
+    """
+
+    def escape(value):
+        """
+        Label value escaping of the text format - backslash,
+        double quote and newline
+        """
+        return (str(value).replace("\\", "\\\\")
+                .replace('"', '\\"').replace("\n", "\\n"))
+
+    def sample(lines: list, name: str, value: float, labels: dict = None):
+        if labels:
+            name += ("{" + ",".join(key + '="' + Metrics.escape(val) + '"'
+                                    for key, val in labels.items()) + "}")
+        lines.append(name + " " + repr(float(value)))
+
+    def header(lines: list, name: str, kind: str, help: str):
+        lines.append("# HELP " + name + " " + help)
+        lines.append("# TYPE " + name + " " + kind)
+
+    def render(stats, user_settings, workers: int):
+        lines = []
+        Metrics.header(lines, "duco_miner_info", "gauge",
+                       "Miner version and settings")
+        Metrics.sample(lines, "duco_miner_info", 1,
+                       {"version": Settings.VER,
+                        "algorithm": user_settings["algorithm"],
+                        "identifier": user_settings["identifier"]})
+        Metrics.header(lines, "duco_miner_start_time_seconds", "gauge",
+                       "Unix time the miner was started at")
+        Metrics.sample(lines, "duco_miner_start_time_seconds",
+                       mining_start_time)
+
+        for name, kind, field, help in [
+                ("duco_shares_accepted_total", "counter", Stats.ACCEPT,
+                 "Shares accepted by the node"),
+                ("duco_shares_rejected_total", "counter", Stats.REJECT,
+                 "Shares rejected by the node"),
+                ("duco_hashrate_hashes_per_second", "gauge", Stats.HASHRATE,
+                 "Hashrate of the last solved job"),
+                ("duco_difficulty", "gauge", Stats.DIFF,
+                 "Difficulty of the last job"),
+                ("duco_last_share_timestamp_seconds", "gauge",
+                 Stats.LAST_SHARE, "Unix time of the last share"),
+                ("duco_connections_total", "counter", Stats.CONNECTS,
+                 "Pool connections opened, reconnects included"),
+                ("duco_worker_heartbeat_timestamp_seconds", "gauge",
+                 Stats.HEARTBEAT, "Unix time of the last heartbeat"),
+                ("duco_worker_restarts_total", "counter", Stats.RESTARTS,
+                 "Worker restarts by the supervisor")]:
+            Metrics.header(lines, name, kind, help)
+            for id in range(workers):
+                Metrics.sample(lines, name, Stats.get(stats, id, field),
+                               {"worker": id})
+
+        for name, hist, buckets, help in [
+                ("duco_share_latency_seconds", Stats.PING_HIST,
+                 Stats.PING_BUCKETS,
+                 "Time between submitting a share and the node's reply"),
+                ("duco_compute_time_seconds", Stats.COMPUTE_HIST,
+                 Stats.COMPUTE_BUCKETS, "Time spent solving a job")]:
+            Metrics.header(lines, name, "histogram", help)
+            for id in range(workers):
+                counts, count, total = Stats.histogram(
+                    stats, id, hist, buckets)
+                for upper_bound, cumulative in zip(buckets, counts):
+                    Metrics.sample(lines, name + "_bucket", cumulative,
+                                   {"worker": id, "le": upper_bound})
+                Metrics.sample(lines, name + "_bucket", count,
+                               {"worker": id, "le": "+Inf"})
+                Metrics.sample(lines, name + "_count", count,
+                               {"worker": id})
+                Metrics.sample(lines, name + "_sum", total,
+                               {"worker": id})
+
+        if Broker.connects:
+            Metrics.header(lines, "duco_broker_connections_total",
+                           "counter", "Broker pool connections opened")
+            for conn_id, connects in sorted(Broker.connects.items()):
+                Metrics.sample(lines, "duco_broker_connections_total",
+                               connects, {"connection": conn_id})
+        return "\n".join(lines) + "\n"
+
+    def start(port: int, stats, user_settings, workers: int):
+        http = Lazy.module("http.server")
+
+        class Handler(http.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = Metrics.render(
+                    stats, user_settings, workers).encode(Settings.ENCODING)
+                self.send_response(200)
+                self.send_header("Content-Type",
+                                 "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        try:
+            server = http.ThreadingHTTPServer(
+                (user_settings.get("metrics_host", ""), port), Handler)
+        except OSError as e:
+            pretty_print("Can't start the metrics endpoint on port "
+                         + str(port) + ": " + str(e), "error")
+            return
+        Thread(target=server.serve_forever, daemon=True).start()
+        pretty_print("Metrics available at " + Fore.RESET + Style.NORMAL
+                     + "http://" + (user_settings.get("metrics_host", "")
+                                    or "0.0.0.0")
+                     + ":" + str(port) + "/metrics", "success")
 
 
 class Discord_rp:
     def connect():
         global RPC
         try:
-            RPC = Presence(808045598447632384)
+            RPC = Lazy.module("pypresence").Presence(808045598447632384)
             RPC.connect()
             Thread(target=Discord_rp.update).start()
         except Exception as e:
@@ -727,11 +2828,14 @@ class Discord_rp:
     def update():
         while True:
             try:
-                total_hashrate = get_prefix("H/s", sum(hashrate.values()), 2)
+                total_hashrate = get_prefix(
+                    "H/s", Stats.total(stats, Stats.HASHRATE), 2)
+                accepted = int(Stats.total(stats, Stats.ACCEPT))
+                rejected = int(Stats.total(stats, Stats.REJECT))
                 RPC.update(details="Hashrate: " + str(total_hashrate),
                            start=mining_start_time,
-                           state=str(accept.value) + "/"
-                           + str(reject.value + accept.value)
+                           state=str(accepted) + "/"
+                           + str(accepted + rejected)
                            + " accepted shares",
                            large_image="ducol",
                            large_text="Duino-Coin, "
@@ -750,26 +2854,90 @@ class Discord_rp:
 if __name__ == "__main__":
     mining_start_time = time()
     p_list = []
-    accept = Manager().Value("i", 0)
-    reject = Manager().Value("i", 0)
-    hashrate = Manager().dict()
-
     signal(SIGINT, handler)
-    Miner.preload()
-    user_settings = Miner.load_cfg()
-    Miner.greeting()
-    fastest_pool = Client.fetch_pool()
-
+    args = Headless.parse_args(sys.argv[1:])
+    Startup.mark("module load")
+    if HEADLESS:
+        Headless.preload()
+        user_settings = Headless.load_cfg(args)
+        Startup.mark("settings")
+        Headless.log("start", version=Settings.VER,
+                     username=user_settings["username"],
+                     algorithm=user_settings["algorithm"],
+                     diff=user_settings["start_diff"],
+                     threads=user_settings["threads"],
+                     intensity=user_settings["intensity"])
+    else:
+        Miner.preload()
+        user_settings = Miner.load_cfg()
+        Startup.mark("settings")
+        Miner.greeting()
+        Startup.mark("greeting")
+    stats = Stats.create(int(user_settings["threads"]))
+    pool = Pools.create(user_settings)
+    if len(pool.nodes) > 1:
+        Thread(target=pool.prober, daemon=True).start()
+    Startup.mark("pool lookup")
+
+    intensity = int(user_settings["intensity"])
+    duty = Governor.create(intensity)
+    if intensity < 100:
+        Lazy.module("psutil")
+        Thread(target=Governor.sampler,
+               args=[duty, intensity], daemon=True).start()
+
+    journal = Journal.start(user_settings)
+    Console.start(float(user_settings.get("console_refresh",
+                                          Console.REFRESH)))
+
+    if user_settings.get("broker", "n") == "y":
+        links = Broker.start(
+            user_settings, pool, stats,
+            int(user_settings.get("broker_connections",
+                                  user_settings["threads"])),
+            int(user_settings["threads"]), journal)
+
+    if int(user_settings.get("metrics_port", 0)):
+        Metrics.start(int(user_settings["metrics_port"]), stats,
+                      user_settings, int(user_settings["threads"]))
+
+    # Connected before the workers start, so that a missing pypresence
+    # can still be installed with a restart
+    if not HEADLESS:
+        Discord_rp.connect()
+    Startup.mark("helpers started")
+
+    worker_plan = Planner.plan(int(user_settings["threads"]),
+                               user_settings.get("affinity", "auto"))
+    team_size = int(user_settings.get("team_size", 1))
+    teams = [None] * int(user_settings["threads"])
+    if team_size > 1 and user_settings.get("broker", "n") != "y":
+        teams = Team.create(int(user_settings["threads"]), team_size)
+    supervisor = Supervisor(stats, float(user_settings.get(
+        "stall_time", Supervisor.STALL_TIME)))
     for i in range(int(user_settings["threads"])):
-        p = Process(target=Miner.mine,
-                    args=[i, user_settings,
-                          fastest_pool, accept, reject,
-                          hashrate])
-        p_list.append(p)
-        p.start()
+        if user_settings.get("broker", "n") == "y":
+            supervisor.start(Miner.mine_brokered,
+                             [i, user_settings,
+                              links[i], stats, duty,
+                              worker_plan[i]])
+        elif teams[i] and i % team_size:
+            supervisor.start(Miner.mine_teamed,
+                             [i, user_settings,
+                              teams[i], i % team_size, stats, duty,
+                              worker_plan[i]])
+        elif int(user_settings.get("pipeline_depth", 1)) > 1:
+            supervisor.start(Miner.mine_pipelined,
+                             [i, user_settings,
+                              pool, stats, duty,
+                              worker_plan[i], journal, teams[i]])
+        else:
+            supervisor.start(Miner.mine,
+                             [i, user_settings,
+                              pool, stats, duty,
+                              worker_plan[i], journal, teams[i]])
         sleep(0.05)
+    Startup.mark("workers started")
+    Startup.report()
 
-    Discord_rp.connect()
-
-    for p in p_list:
-        p.join()
+    supervisor.watch()
@@ -0,0 +1,239 @@
+/*
+ * Duino-Coin native DUCO-S1 kernel for the PC Miner
+ * https://github.com/revoxhere/duino-coin
+ * Distributed under MIT license
+ * © Duino-Coin Community 2019-2021
+ *
+ * Searches nonces in [start, end] for which
+ * sha1(last_h + str(nonce)) == target and returns the nonce or -1.
+ * Loaded by PC_Miner.py through ctypes, which releases the GIL for
+ * the whole call. Build with `make` in this directory.
+ *
+ * When built with DUCO_OPENSSL (the Makefile does this if the OpenSSL
+ * headers are found) hashing goes through libcrypto, which uses the
+ * SHA extensions of the CPU where available.
+ */
+
+#include <stdint.h>
+#include <string.h>
+
+#ifdef DUCO_OPENSSL
+#define OPENSSL_SUPPRESS_DEPRECATED
+#include <openssl/sha.h>
+#endif
+
+#if defined(_WIN32)
+#define DUCO_EXPORT __declspec(dllexport)
+#else
+#define DUCO_EXPORT __attribute__((visibility("default")))
+#endif
+
+#ifndef DUCO_OPENSSL
+/* Portable SHA-1, only needed without libcrypto */
+#define ROL(x, n) (((x) << (n)) | ((x) >> (32 - (n))))
+
+typedef struct {
+    uint32_t h[5];
+    uint8_t block[64];
+    size_t used;
+    uint64_t length;
+} sha1_ctx;
+
+static void sha1_compress(uint32_t h[5], const uint8_t block[64])
+{
+    uint32_t w[80];
+    uint32_t a, b, c, d, e, tmp;
+    int i;
+
+    for (i = 0; i < 16; i++)
+        w[i] = (uint32_t)block[i * 4] << 24
+             | (uint32_t)block[i * 4 + 1] << 16
+             | (uint32_t)block[i * 4 + 2] << 8
+             | (uint32_t)block[i * 4 + 3];
+    for (i = 16; i < 80; i++)
+        w[i] = ROL(w[i - 3] ^ w[i - 8] ^ w[i - 14] ^ w[i - 16], 1);
+
+    a = h[0]; b = h[1]; c = h[2]; d = h[3]; e = h[4];
+    for (i = 0; i < 20; i++) {
+        tmp = ROL(a, 5) + ((b & c) | (~b & d)) + e + 0x5A827999 + w[i];
+        e = d; d = c; c = ROL(b, 30); b = a; a = tmp;
+    }
+    for (; i < 40; i++) {
+        tmp = ROL(a, 5) + (b ^ c ^ d) + e + 0x6ED9EBA1 + w[i];
+        e = d; d = c; c = ROL(b, 30); b = a; a = tmp;
+    }
+    for (; i < 60; i++) {
+        tmp = ROL(a, 5) + ((b & c) | (b & d) | (c & d)) + e
+              + 0x8F1BBCDC + w[i];
+        e = d; d = c; c = ROL(b, 30); b = a; a = tmp;
+    }
+    for (; i < 80; i++) {
+        tmp = ROL(a, 5) + (b ^ c ^ d) + e + 0xCA62C1D6 + w[i];
+        e = d; d = c; c = ROL(b, 30); b = a; a = tmp;
+    }
+    h[0] += a; h[1] += b; h[2] += c; h[3] += d; h[4] += e;
+}
+
+static void sha1_init(sha1_ctx *ctx)
+{
+    ctx->h[0] = 0x67452301;
+    ctx->h[1] = 0xEFCDAB89;
+    ctx->h[2] = 0x98BADCFE;
+    ctx->h[3] = 0x10325476;
+    ctx->h[4] = 0xC3D2E1F0;
+    ctx->used = 0;
+    ctx->length = 0;
+}
+
+static void sha1_update(sha1_ctx *ctx, const uint8_t *data, size_t len)
+{
+    ctx->length += len;
+    while (len > 0) {
+        size_t take = 64 - ctx->used;
+        if (take > len)
+            take = len;
+        memcpy(ctx->block + ctx->used, data, take);
+        ctx->used += take;
+        data += take;
+        len -= take;
+        if (ctx->used == 64) {
+            sha1_compress(ctx->h, ctx->block);
+            ctx->used = 0;
+        }
+    }
+}
+
+static void sha1_final(sha1_ctx *ctx, uint8_t out[20])
+{
+    uint64_t bits = ctx->length * 8;
+    int i;
+
+    ctx->block[ctx->used++] = 0x80;
+    if (ctx->used > 56) {
+        memset(ctx->block + ctx->used, 0, 64 - ctx->used);
+        sha1_compress(ctx->h, ctx->block);
+        ctx->used = 0;
+    }
+    memset(ctx->block + ctx->used, 0, 56 - ctx->used);
+    for (i = 0; i < 8; i++)
+        ctx->block[56 + i] = (uint8_t)(bits >> (56 - i * 8));
+    sha1_compress(ctx->h, ctx->block);
+
+    for (i = 0; i < 5; i++) {
+        out[i * 4] = (uint8_t)(ctx->h[i] >> 24);
+        out[i * 4 + 1] = (uint8_t)(ctx->h[i] >> 16);
+        out[i * 4 + 2] = (uint8_t)(ctx->h[i] >> 8);
+        out[i * 4 + 3] = (uint8_t)ctx->h[i];
+    }
+}
+#endif
+
+static size_t format_nonce(uint64_t nonce, uint8_t *out)
+{
+    uint8_t digits[20];
+    size_t len = 0, i;
+
+    do {
+        digits[len++] = (uint8_t)('0' + nonce % 10);
+        nonce /= 10;
+    } while (nonce > 0);
+    for (i = 0; i < len; i++)
+        out[i] = digits[len - 1 - i];
+    return len;
+}
+
+/* Increments the ASCII decimal number in place, returns its new length */
+static size_t increment_nonce(uint8_t *digits, size_t len)
+{
+    size_t i = len;
+
+    while (i > 0) {
+        if (digits[i - 1] != '9') {
+            digits[i - 1]++;
+            return len;
+        }
+        digits[i - 1] = '0';
+        i--;
+    }
+    memmove(digits + 1, digits, len);
+    digits[0] = '1';
+    return len + 1;
+}
+
+DUCO_EXPORT int64_t ducos1_search(const char *last_h, size_t last_h_len,
+                                  const uint8_t *target,
+                                  uint64_t start, uint64_t end)
+{
+    uint8_t digest[20];
+    uint8_t nonce_str[21];
+    uint64_t nonce;
+    size_t len;
+#ifdef DUCO_OPENSSL
+    SHA_CTX ossl_base, ossl_ctx;
+
+    SHA1_Init(&ossl_base);
+    SHA1_Update(&ossl_base, last_h, last_h_len);
+    len = format_nonce(start, nonce_str);
+    for (nonce = start; nonce <= end; nonce++) {
+        ossl_ctx = ossl_base;
+        SHA1_Update(&ossl_ctx, nonce_str, len);
+        SHA1_Final(digest, &ossl_ctx);
+        if (digest[0] == target[0] && memcmp(digest, target, 20) == 0)
+            return (int64_t)nonce;
+        len = increment_nonce(nonce_str, len);
+    }
+    return -1;
+#else
+    sha1_ctx base, ctx;
+    uint8_t block[64];
+    uint32_t h[5];
+    uint64_t bits;
+    size_t i;
+
+    /* Full 64-byte blocks of the prefix are compressed only once */
+    sha1_init(&base);
+    sha1_update(&base, (const uint8_t *)last_h, last_h_len);
+    len = format_nonce(start, nonce_str);
+
+    /* The longest nonce of the range is the decimal form of `end`,
+     * a 40 hex digit last_h leaves room for up to 15 digits */
+    if (base.used + format_nonce(end, block) + 9 > 64) {
+        /* Tail does not fit into one padded block, take the slow path */
+        for (nonce = start; nonce <= end; nonce++) {
+            ctx = base;
+            sha1_update(&ctx, nonce_str, len);
+            sha1_final(&ctx, digest);
+            if (memcmp(digest, target, 20) == 0)
+                return (int64_t)nonce;
+            len = increment_nonce(nonce_str, len);
+        }
+        return -1;
+    }
+
+    memcpy(block, base.block, base.used);
+    for (nonce = start; nonce <= end; nonce++) {
+        memcpy(block + base.used, nonce_str, len);
+        block[base.used + len] = 0x80;
+        memset(block + base.used + len + 1, 0, 55 - base.used - len);
+        bits = (base.length + len) * 8;
+        for (i = 0; i < 8; i++)
+            block[56 + i] = (uint8_t)(bits >> (56 - i * 8));
+
+        memcpy(h, base.h, sizeof(h));
+        sha1_compress(h, block);
+        if (h[0] == ((uint32_t)target[0] << 24 | (uint32_t)target[1] << 16
+                     | (uint32_t)target[2] << 8 | (uint32_t)target[3])) {
+            for (i = 0; i < 5; i++) {
+                digest[i * 4] = (uint8_t)(h[i] >> 24);
+                digest[i * 4 + 1] = (uint8_t)(h[i] >> 16);
+                digest[i * 4 + 2] = (uint8_t)(h[i] >> 8);
+                digest[i * 4 + 3] = (uint8_t)h[i];
+            }
+            if (memcmp(digest, target, 20) == 0)
+                return (int64_t)nonce;
+        }
+        len = increment_nonce(nonce_str, len);
+    }
+    return -1;
+#endif
+}
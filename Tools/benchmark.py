@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Duino-Coin hashing benchmark © MIT licensed
+https://duinocoin.com
+https://github.com/revoxhere/duino-coin
+Duino-Coin Team & Community 2019-2021
+
+Runs every DUCO-S1 / XXHASH implementation over the same deterministic
+set of jobs, single-core and with several worker processes, and prints
+the results as JSON so they can be compared across releases:
+    python3 Tools/benchmark.py --diffs 1500,15000 --workers 1,2,4 > bench.json
+"""
+
+from argparse import ArgumentParser
+from hashlib import sha1
+from multiprocessing import Pool, cpu_count
+from pathlib import Path
+from random import Random
+from statistics import mean, pstdev
+from time import time
+import json
+import platform
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import PC_Miner  # noqa: E402
+from mock_node import make_job  # noqa: E402
+
+try:
+    import xxhash
+    xxhash_en = True
+except ModuleNotFoundError:
+    xxhash_en = False
+
+
+def minimal_ducos1(last_h: str, exp_h: str, diff: int):
+    """
+    Inner loop of Unofficial miners/Minimal_PC_Miner.py
+    """
+    base_hash = sha1(str(last_h).encode('ascii'))
+    for result in range(100 * int(diff) + 1):
+        temp_hash = base_hash.copy()
+        temp_hash.update(str(result).encode('ascii'))
+        if exp_h == temp_hash.hexdigest():
+            return result
+
+
+def minimal_xxhash(last_h: str, exp_h: str, diff: int):
+    """
+    Inner loop of Unofficial miners/Minimal_PC_Miner_XXHASH.py
+    (encoded first, xxhash 2.0+ refuses str input)
+    """
+    for result in range(100 * int(diff) + 1):
+        ducos1xx = xxhash.xxh64(
+            (str(last_h) + str(result)).encode('ascii'),
+            seed=2811).hexdigest()
+        if exp_h == ducos1xx:
+            return result
+
+
+def multithreaded_ducos1(last_h: str, exp_h: str, diff: int):
+    """
+    Inner loop of Unofficial miners/Multithreaded_PC_Miner.py
+    """
+    for result in range(100 * int(diff) + 1):
+        ducos1 = sha1(str(last_h + str(result)).encode("utf-8")).hexdigest()
+        if exp_h == ducos1:
+            return result
+
+
+def pc_miner(solve):
+    return lambda last_h, exp_h, diff: solve(last_h, exp_h, diff)[0]
+
+
+def implementations():
+    """
+    Returns {name: (algorithm, solve function)} of everything
+    that can run on this machine
+    """
+    impls = {
+        "pc_miner_ducos1": ("DUCO-S1", pc_miner(PC_Miner.Algorithms.DUCOS1)),
+        "minimal_ducos1": ("DUCO-S1", minimal_ducos1),
+        "multithreaded_ducos1": ("DUCO-S1", multithreaded_ducos1),
+    }
+    if PC_Miner.Kernel.load():
+        impls["pc_miner_kernel"] = ("DUCO-S1",
+                                    pc_miner(PC_Miner.Kernel.DUCOS1))
+    if xxhash_en:
+        impls["pc_miner_xxhash"] = ("XXHASH",
+                                    pc_miner(PC_Miner.Algorithms.XXHASH))
+        impls["minimal_xxhash"] = ("XXHASH", minimal_xxhash)
+    return impls
+
+
+def warm_up(_):
+    """
+    Loads everything a worker needs before the timed run
+    """
+    implementations()
+
+
+def run_jobs(args):
+    """
+    Solves a deterministic batch of jobs, returns
+    (hashes done, [time to solution of every job], start, end)
+    - start and end are taken in the worker around the hashing only
+    """
+    name, diff, jobs, seed = args
+    algorithm, solve = implementations()[name]
+    rng = Random(seed)
+    hashes, times = 0, []
+    started = time()
+    for _ in range(jobs):
+        last_h, exp_h, nonce = make_job(algorithm, diff, rng)
+        start = time()
+        result = solve(last_h, exp_h, diff)
+        times.append(time() - start)
+        if result != nonce:
+            raise RuntimeError(name + " returned " + str(result)
+                               + " instead of " + str(nonce))
+        hashes += nonce + 1
+    return hashes, times, started, time()
+
+
+def bench(name: str, diff: int, jobs: int, workers: int, seed: int):
+    """
+    Runs the same job batch in every worker process at once.
+    The pool is started and warmed up first, and the wall time spans
+    the hashing in the workers only, so process creation and imports
+    don't count
+    """
+    batches = [(name, diff, jobs, seed + worker)
+               for worker in range(workers)]
+    if workers == 1:
+        results = [run_jobs(batches[0])]
+    else:
+        with Pool(workers) as pool:
+            pool.map(warm_up, range(workers), chunksize=1)
+            results = pool.map(run_jobs, batches, chunksize=1)
+    wall = (max(result[3] for result in results)
+            - min(result[2] for result in results))
+
+    hashes = sum(result[0] for result in results)
+    times = [t for result in results for t in result[1]]
+    rates = [(batch_hashes / sum(batch_times))
+             for batch_hashes, batch_times, _, _ in results]
+    return {"workers": workers,
+            "hashrate": hashes / wall,
+            "worker_hashrate_mean": mean(rates),
+            "worker_hashrate_stdev": pstdev(rates),
+            "time_to_solution_mean": mean(times),
+            "time_to_solution_stdev": pstdev(times),
+            "time_to_solution_max": max(times),
+            "jobs": len(times)}
+
+
+def main(argv=None):
+    parser = ArgumentParser(description="Duino-Coin hashing benchmark")
+    parser.add_argument("--diffs", default="1500,15000",
+                        help="comma separated difficulties")
+    parser.add_argument("--workers", default=None,
+                        help="comma separated worker counts "
+                        + "(default: powers of two up to the CPU count)")
+    parser.add_argument("--jobs", type=int, default=10,
+                        help="jobs solved by every worker")
+    parser.add_argument("--only", default=None,
+                        help="comma separated implementation names")
+    parser.add_argument("--seed", type=int, default=2811)
+    args = parser.parse_args(argv)
+
+    if args.workers:
+        worker_counts = [int(w) for w in args.workers.split(",")]
+    else:
+        worker_counts = [1]
+        while worker_counts[-1] * 2 <= cpu_count():
+            worker_counts.append(worker_counts[-1] * 2)
+
+    names = list(implementations())
+    if args.only:
+        names = [name for name in names if name in args.only.split(",")]
+
+    report = {"version": PC_Miner.Settings.VER,
+              "python": platform.python_version(),
+              "machine": platform.machine(),
+              "cpu_count": cpu_count(),
+              "seed": args.seed,
+              "results": []}
+
+    for name in names:
+        for diff in [int(d) for d in args.diffs.split(",")]:
+            runs = []
+            for workers in worker_counts:
+                run = bench(name, diff, args.jobs, workers, args.seed)
+                # Speedup relative to the ideal linear one
+                base = runs[0] if runs else run
+                run["scaling_efficiency"] = (
+                    (run["hashrate"] / workers)
+                    / (base["hashrate"] / base["workers"]))
+                runs.append(run)
+                print(name + " diff " + str(diff)
+                      + " workers " + str(workers) + ": "
+                      + PC_Miner.get_prefix("H/s", run["hashrate"], 2),
+                      file=sys.stderr, flush=True)
+            report["results"].append({"implementation": name,
+                                      "algorithm": implementations()[name][0],
+                                      "difficulty": diff,
+                                      "runs": runs})
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Duino-Coin mock pool node © MIT licensed
+https://duinocoin.com
+https://github.com/revoxhere/duino-coin
+Duino-Coin Team & Community 2019-2021
+
+Local stand-in for a pool node, speaking the same tiny text protocol
+as the real ones, for load-testing and benchmarking the miners offline:
+    python3 Tools/mock_node.py --port 2811 --latency 50 --error-rate 0.01
+    DUCO_NODE=127.0.0.1:2811 python3 PC_Miner.py
+
+Jobs are generated with DUCO-S1 or XXHASH at configurable difficulties
+and every submitted nonce is verified by hashing it again
+"""
+
+from argparse import ArgumentParser
+from hashlib import sha1
+from random import Random
+from time import time
+import asyncio
+
+try:
+    from xxhash import xxh64
+    xxhash_en = True
+except ModuleNotFoundError:
+    xxhash_en = False
+
+
+class Settings:
+    """
+    Class containing default mock node settings
+    """
+    ENCODING = "UTF8"
+    SEPARATOR = ","
+    VER = "2.7"
+    MOTD = "You are mining on a local mock node"
+    XXHASH_SEED = 2811
+    DIFFS = {"LOW": 1_500,
+             "MEDIUM": 15_000,
+             "NET": 50_000,
+             "AVR": 6,
+             "ESP8266": 1_000,
+             "ESP32": 1_500}
+    DEFAULT_DIFF = "NET"
+    REPORT_TIME = 10
+
+
+def make_job(algorithm: str, diff: int, rng: Random):
+    """
+    Returns (last_h, exp_h, nonce) of a new job - the nonce is drawn
+    uniformly from range(100 * diff + 1) like on the real nodes
+    """
+    last_h = "%040x" % rng.getrandbits(160)
+    nonce = rng.randint(0, 100 * diff)
+    return last_h, expected_hash(algorithm, last_h, nonce), nonce
+
+
+def expected_hash(algorithm: str, last_h: str, nonce: int):
+    data = (last_h + str(nonce)).encode("ascii")
+    if algorithm == "XXHASH":
+        return xxh64(data, seed=Settings.XXHASH_SEED).hexdigest()
+    return sha1(data).hexdigest()
+
+
+class Stats:
+    """
+    Counters shared by all of the connections
+    """
+    connections = 0
+    jobs = 0
+    good = 0
+    bad = 0
+    errors = 0
+
+
+class Node:
+    """
+    Single client connection
+    """
+
+    def __init__(self, args, rng: Random):
+        self.args = args
+        self.rng = rng
+        self.job = None
+
+    async def send(self, writer, msg: str):
+        if self.args.latency or self.args.jitter:
+            await asyncio.sleep(
+                (self.args.latency
+                 + self.rng.uniform(0, self.args.jitter)) / 1000)
+        writer.write((msg + "\n").encode(Settings.ENCODING))
+        await writer.drain()
+
+    async def inject_error(self, writer):
+        """
+        Randomly misbehaves like an overloaded node would,
+        returns True if the connection has to be closed
+        """
+        if self.rng.random() >= self.args.error_rate:
+            return False
+
+        Stats.errors += 1
+        error = self.rng.choice(["drop", "garbage", "stall"])
+        if error == "drop":
+            return True
+        elif error == "garbage":
+            writer.write(b"\x00NOPE\n")
+            await writer.drain()
+        else:
+            await asyncio.sleep(self.args.stall)
+        return False
+
+    def diff_for(self, tier: str):
+        return self.args.diffs.get(tier.upper(),
+                                   self.args.diffs[Settings.DEFAULT_DIFF])
+
+    def handle_job(self, msg: list):
+        algorithm = "XXHASH" if msg[0] == "JOBXX" else "DUCO-S1"
+        if algorithm == "XXHASH" and not xxhash_en:
+            return "BAD,XXHASH is not available on this node"
+
+        tier = msg[2] if len(msg) > 2 else Settings.DEFAULT_DIFF
+        diff = self.diff_for(tier)
+        last_h, exp_h, nonce = make_job(algorithm, diff, self.rng)
+        self.job = (algorithm, last_h, exp_h, diff)
+        Stats.jobs += 1
+        return Settings.SEPARATOR.join([last_h, exp_h, str(diff)])
+
+    def handle_result(self, msg: list):
+        if not self.job:
+            return "BAD"
+
+        algorithm, last_h, exp_h, diff = self.job
+        self.job = None
+        try:
+            nonce = int(msg[0])
+        except ValueError:
+            Stats.bad += 1
+            return "BAD"
+
+        if (0 <= nonce <= 100 * diff
+                and expected_hash(algorithm, last_h, nonce) == exp_h):
+            Stats.good += 1
+            if self.rng.random() < self.args.block_rate:
+                return "BLOCK"
+            return "GOOD"
+
+        Stats.bad += 1
+        return "BAD"
+
+    async def serve(self, reader, writer):
+        Stats.connections += 1
+        try:
+            await self.send(writer, Settings.VER)
+            while True:
+                data = await reader.read(1024)
+                if not data:
+                    break
+                if await self.inject_error(writer):
+                    break
+
+                msg = data.decode(Settings.ENCODING, "replace").strip()
+                msg = msg.split(Settings.SEPARATOR)
+                if msg[0] == "MOTD":
+                    reply = Settings.MOTD
+                elif msg[0] == "PING":
+                    reply = "Pong!"
+                elif msg[0] in ("JOB", "JOBXX"):
+                    reply = self.handle_job(msg)
+                else:
+                    reply = self.handle_result(msg)
+                await self.send(writer, reply)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            Stats.connections -= 1
+            writer.close()
+
+
+async def report():
+    last_time, last_good = time(), 0
+    while True:
+        await asyncio.sleep(Settings.REPORT_TIME)
+        now = time()
+        print("connections " + str(Stats.connections)
+              + " ∙ jobs " + str(Stats.jobs)
+              + " ∙ good " + str(Stats.good)
+              + " ∙ bad " + str(Stats.bad)
+              + " ∙ injected errors " + str(Stats.errors)
+              + " ∙ " + str(round((Stats.good - last_good)
+                                  / (now - last_time), 1))
+              + " shares/s", flush=True)
+        last_time, last_good = now, Stats.good
+
+
+async def main(args):
+    rng = Random(args.seed)
+    server = await asyncio.start_server(
+        lambda r, w: Node(args, rng).serve(r, w),
+        args.host, args.port, backlog=args.backlog)
+    print("Mock node v" + Settings.VER + " listening on "
+          + args.host + ":" + str(args.port)
+          + " ∙ diffs " + str(args.diffs), flush=True)
+    asyncio.ensure_future(report())
+    async with server:
+        await server.serve_forever()
+
+
+def parse_args(argv=None):
+    parser = ArgumentParser(description="Duino-Coin mock pool node")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=2811)
+    parser.add_argument("--diff", action="append", default=[],
+                        metavar="TIER=DIFF",
+                        help="override a difficulty tier, e.g. LOW=500")
+    parser.add_argument("--latency", type=float, default=0,
+                        help="delay added to every reply (ms)")
+    parser.add_argument("--jitter", type=float, default=0,
+                        help="random extra delay up to this value (ms)")
+    parser.add_argument("--error-rate", type=float, default=0,
+                        help="probability of an injected error per message")
+    parser.add_argument("--stall", type=float, default=5,
+                        help="duration of an injected stall (s)")
+    parser.add_argument("--block-rate", type=float, default=0,
+                        help="probability of replying BLOCK to a good share")
+    parser.add_argument("--backlog", type=int, default=4096)
+    parser.add_argument("--seed", type=int, default=None,
+                        help="seed for reproducible jobs")
+    args = parser.parse_args(argv)
+
+    args.diffs = dict(Settings.DIFFS)
+    for override in args.diff:
+        tier, diff = override.split("=")
+        args.diffs[tier.upper()] = int(diff)
+    return args
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main(parse_args()))
+    except KeyboardInterrupt:
+        pass
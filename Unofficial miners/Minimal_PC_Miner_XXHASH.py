@@ -15,6 +15,10 @@ import xxhash  # use python3 -m pip install xxhash to install xxhash
 soc = None
 
 AVAILABLE_PORTS = [2812, 2813, 2814, 2815, 2816]
+SERVER_IP = "server.duinocoin.com"
+if os.environ.get("DUCO_NODE"):  # host:port, e.g. a local mock node
+    SERVER_IP, port = os.environ["DUCO_NODE"].rsplit(":", 1)
+    AVAILABLE_PORTS = [int(port)]
 soc = None
 
 username = input('Username?\n> ')
@@ -55,7 +59,7 @@ def get_fastest_connection(server_ip: str):
 while True:
     try:
         print('Searching for fastest connection to the server')
-        soc = get_fastest_connection(str("server.duinocoin.com"))
+        soc = get_fastest_connection(SERVER_IP)
         print('Fastest connection found')
 
         # Mining section
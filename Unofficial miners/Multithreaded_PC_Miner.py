@@ -71,15 +71,20 @@ def hashrateCalculator():
     threading.Timer(1.0, hashrateCalculator).start()
 
     
+def get_pool():
+    if os.environ.get("DUCO_NODE"): # host:port, e.g. a local mock node
+        return os.environ["DUCO_NODE"].rsplit(":", 1)
+    serverip = "https://raw.githubusercontent.com/revoxhere/duino-coin/gh-pages/serverip.txt"
+    with urllib.request.urlopen(serverip) as content:
+        content = content.read().decode().splitlines()
+    return content[0], content[1]
+
+
 def start_thread(arr, i, username, accepted_shares, bad_shares, thread_number):
     global hash_count, khash_count
     soc = socket.socket()
 
-    serverip = "https://raw.githubusercontent.com/revoxhere/duino-coin/gh-pages/serverip.txt"
-    with urllib.request.urlopen(serverip) as content:
-        content = content.read().decode().splitlines()
-    pool_address = content[0]
-    pool_port = content[1]
+    pool_address, pool_port = get_pool()
 
     soc.connect((str(pool_address), int(pool_port)))
     soc.recv(3).decode()
@@ -228,10 +233,7 @@ if __name__ == '__main__':
     if (autorestart_time) > 0:
         threading.Thread(target=autorestarter).start()
 
-    with urllib.request.urlopen("https://raw.githubusercontent.com/revoxhere/duino-coin/gh-pages/serverip.txt") as content:
-        content = content.read().decode().splitlines() # doing this here because can't access pool_address and pool_port in the threads
-    pool_address = content[0]
-    pool_port = content[1]
+    pool_address, pool_port = get_pool() # doing this here because can't access pool_address and pool_port in the threads
     
     arguments = len(sys.argv)
     if arguments <= 3: